@@ -33,6 +33,14 @@ GMAIL_MAX_RESULTS_PER_PAGE = int(os.getenv("GMAIL_MAX_RESULTS_PER_PAGE", "100"))
 GMAIL_MAX_PAGES = int(os.getenv("GMAIL_MAX_PAGES", "5"))
 GMAIL_BULK_MAX_PAGES = int(os.getenv("GMAIL_BULK_MAX_PAGES", "200"))
 GMAIL_TARGET_TOTAL_EMAILS = int(os.getenv("GMAIL_TARGET_TOTAL_EMAILS", "15000"))
+# Cap stored body text; every downstream consumer reads at most a short
+# preview, so multi-MB bodies only bloat the DB and slow its scans
+GMAIL_BODY_MAX_CHARS = int(os.getenv("GMAIL_BODY_MAX_CHARS", "65536"))
+# Fast body mode: for simple (non-multipart) messages whose snippet is
+# already a full-length preview, store the snippet and skip body
+# parsing entirely. Off by default — bodies are shorter than snippets
+# only on trivial mail, but classifiers may still want the real text.
+GMAIL_FAST_BODY_MODE = os.getenv("GMAIL_FAST_BODY_MODE", "0") == "1"
 
 # ---------------------------------------------------------------------------
 # LLM (for generating training labels)
@@ -111,15 +119,21 @@ PRIORITY_ORDER = [
     "account_service",
 ]
 
-# Labels that represent actionable emails (need user response)
-ACTION_LABELS = {
+# Precomputed label -> rank for O(1) priority sorting
+# (instead of repeated PRIORITY_ORDER.index scans)
+PRIORITY_RANK = {label: i for i, label in enumerate(PRIORITY_ORDER)}
+
+# Labels that represent actionable emails (need user response).
+# frozenset: hashed O(1) membership in digest filters, immutable so
+# nothing can accidentally mutate the taxonomy at runtime.
+ACTION_LABELS = frozenset({
     "job_interview",
     "security_auth",
     "job_opportunity",
     "personal",
     "finance_alert",
     "events_calendar",
-}
+})
 
 # ---------------------------------------------------------------------------
 # Auto-evolve settings
@@ -120,6 +120,10 @@ def run_evolution_cycle() -> dict:
                 summary["retrained"] = True
                 summary["accuracy"] = metrics.get("accuracy")
 
+                # Drop the cached model so the next cycle uses the new version
+                from src.classify import invalidate_model_cache
+                invalidate_model_cache()
+
                 # Compare with previous version
                 if previous_version:
                     summary["previous_accuracy"] = previous_version["accuracy"]
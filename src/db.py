@@ -5,8 +5,11 @@ All modules import from here instead of managing their own connections.
 Handles schema creation, migrations, and common queries.
 """
 
+import atexit
+import json
 import sqlite3
 import logging
+import threading
 from contextlib import contextmanager
 from datetime import datetime, timedelta
 
@@ -14,22 +17,112 @@ import config
 
 logger = logging.getLogger(__name__)
 
+# One long-lived connection per thread: re-opening the DB (plus its -wal
+# and -shm siblings) on every helper call costs syscalls and loses the
+# page cache. Flask serves each request on a worker thread, so each
+# worker gets its own connection.
+_local = threading.local()
+_all_connections = []
+
+
+def _get_thread_connection() -> sqlite3.Connection:
+    """Return this thread's cached connection, opening it on first use."""
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        config.DATA_DIR.mkdir(parents=True, exist_ok=True)
+        # check_same_thread=False so the atexit hook can close
+        # connections opened by worker threads; cached_statements keeps
+        # compiled plans for every hot query alive so repeated helper
+        # calls skip SQLite's parser entirely
+        conn = sqlite3.connect(
+            str(config.DB_PATH),
+            check_same_thread=False,
+            cached_statements=256,
+        )
+        conn.row_factory = sqlite3.Row
+        # Per-connection tuning. journal_mode=WAL is NOT repeated here:
+        # it persists in the database file once init_db() sets it, and
+        # re-issuing it costs a parse + WAL-index write per connection.
+        #   synchronous   - NORMAL is durable enough under WAL, far fewer fsyncs
+        #   busy_timeout  - wait out the single-writer lock instead of failing
+        #   temp_store    - keep sort/temp b-trees in memory
+        #   cache_size    - 64 MB page cache (negative value = KB)
+        #   mmap_size     - serve up to 256 MB of pages straight from the
+        #                   kernel page cache instead of pread() per page
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=30000")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute("PRAGMA cache_size=-65536")
+        conn.execute("PRAGMA mmap_size=268435456")
+        _local.conn = conn
+        _all_connections.append(conn)
+    return conn
+
+
+def _get_thread_ro_connection() -> sqlite3.Connection:
+    """
+    Return this thread's cached read-only connection.
+
+    Read helpers use mode=ro + query_only so they never contend for
+    SQLite's single writer lock; WAL (set in init_db) lets them read
+    concurrently with any writer.
+    """
+    conn = getattr(_local, "ro_conn", None)
+    if conn is None:
+        conn = sqlite3.connect(
+            f"file:{config.DB_PATH}?mode=ro",
+            uri=True,
+            check_same_thread=False,
+            cached_statements=256,
+        )
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA query_only=1")
+        conn.execute("PRAGMA busy_timeout=30000")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute("PRAGMA cache_size=-65536")
+        conn.execute("PRAGMA mmap_size=268435456")
+        _local.ro_conn = conn
+        _all_connections.append(conn)
+    return conn
+
+
+@atexit.register
+def _close_connections():
+    """Close all cached connections at interpreter shutdown."""
+    for conn in _all_connections:
+        try:
+            conn.execute("PRAGMA optimize")
+            conn.close()
+        except sqlite3.Error:
+            pass
+    _all_connections.clear()
+
 
 @contextmanager
 def get_connection():
-    """Yield a SQLite connection with Row factory. Auto-commits and closes."""
-    config.DATA_DIR.mkdir(parents=True, exist_ok=True)
-    conn = sqlite3.connect(str(config.DB_PATH))
-    conn.row_factory = sqlite3.Row
-    conn.execute("PRAGMA journal_mode=WAL")  # Allow concurrent reads during writes
+    """Yield this thread's SQLite connection. Auto-commits on success."""
+    conn = _get_thread_connection()
     try:
         yield conn
         conn.commit()
     except Exception:
         conn.rollback()
         raise
-    finally:
-        conn.close()
+
+
+@contextmanager
+def get_ro_connection():
+    """
+    Yield this thread's read-only connection (for SELECT-only helpers).
+
+    Falls back to the read-write connection if the database file does
+    not exist yet (mode=ro cannot create it).
+    """
+    try:
+        conn = _get_thread_ro_connection()
+    except sqlite3.OperationalError:
+        conn = _get_thread_connection()
+    yield conn
 
 
 def _migrate_emails_table_v2(conn):
@@ -44,13 +137,23 @@ def _migrate_emails_table_v2(conn):
     5. Recreate indexes
 
     The id column is preserved so email_labels foreign keys remain valid.
+
+    The whole rebuild runs as ONE transaction (executescript with an
+    explicit BEGIN/COMMIT): no half-migrated state is ever visible or
+    durable, and the batch pays a single fsync instead of one per
+    statement. defer_foreign_keys keeps FK checks out of the middle
+    state, and the indexes are built AFTER the bulk copy so the insert
+    doesn't pay per-row index maintenance.
     """
     logger.info("Migration: rebuilding emails table for multi-account support...")
 
-    conn.execute("ALTER TABLE emails RENAME TO emails_old;")
-
-    conn.execute(
+    conn.executescript(
         """
+        BEGIN IMMEDIATE;
+        PRAGMA defer_foreign_keys=ON;
+
+        ALTER TABLE emails RENAME TO emails_old;
+
         CREATE TABLE emails (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             gmail_id TEXT,
@@ -66,35 +169,73 @@ def _migrate_emails_table_v2(conn):
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             UNIQUE(account_email, gmail_id)
         );
-        """
-    )
 
-    conn.execute(
-        """
         INSERT INTO emails (id, gmail_id, account_email, thread_id, internal_date,
                            from_addr, to_addr, subject, snippet, body, label_ids, created_at)
         SELECT id, gmail_id, 'unknown', thread_id, internal_date,
                from_addr, to_addr, subject, snippet, body, label_ids, created_at
         FROM emails_old;
-        """
-    )
 
-    conn.execute("DROP TABLE emails_old;")
+        DROP TABLE emails_old;
 
-    conn.execute(
-        """
-        CREATE INDEX IF NOT EXISTS idx_emails_internal_date
-        ON emails(internal_date);
+        CREATE INDEX IF NOT EXISTS idx_emails_recent
+        ON emails(internal_date DESC, id, from_addr, subject);
+
+        CREATE INDEX IF NOT EXISTS idx_emails_account_date
+        ON emails(account_email, internal_date DESC);
+
+        COMMIT;
         """
     )
-    conn.execute(
+
+    logger.info("Migration: emails table rebuilt with account_email column")
+
+
+def _migrate_email_labels_v3(conn):
+    """
+    Migrate email_labels from per-row label text to label_id references.
+
+    The same ~15 label strings were stored on every row; dictionary
+    encoding shrinks the table and its indexes and turns the hot
+    GROUP BY label into integer grouping. Same single-transaction
+    rebuild pattern as the emails v2 migration.
+    """
+    logger.info("Migration: dictionary-encoding email_labels.label...")
+
+    conn.executescript(
         """
-        CREATE INDEX IF NOT EXISTS idx_emails_account
-        ON emails(account_email);
+        BEGIN IMMEDIATE;
+        PRAGMA defer_foreign_keys=ON;
+
+        INSERT OR IGNORE INTO labels (name)
+        SELECT DISTINCT label FROM email_labels;
+
+        ALTER TABLE email_labels RENAME TO email_labels_old;
+
+        CREATE TABLE email_labels (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            email_id INTEGER NOT NULL,
+            label_id INTEGER NOT NULL,
+            confidence REAL DEFAULT 1.0,
+            source TEXT DEFAULT 'manual',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE(email_id),
+            FOREIGN KEY(email_id) REFERENCES emails(id),
+            FOREIGN KEY(label_id) REFERENCES labels(id)
+        );
+
+        INSERT INTO email_labels (id, email_id, label_id, confidence, source, created_at)
+        SELECT o.id, o.email_id, lab.id, o.confidence, o.source, o.created_at
+        FROM email_labels_old o
+        JOIN labels lab ON lab.name = o.label;
+
+        DROP TABLE email_labels_old;
+
+        COMMIT;
         """
     )
 
-    logger.info("Migration: emails table rebuilt with account_email column")
+    logger.info("Migration: email_labels rebuilt with label_id references")
 
 
 def init_db():
@@ -102,6 +243,28 @@ def init_db():
     with get_connection() as conn:
         cur = conn.cursor()
 
+        # 8K pages halve per-row header overhead and page count for the
+        # read-heavy digest scans. Must be set before the first write on
+        # a fresh DB; an existing DB with smaller pages is rebuilt once
+        # (page size can't change after entering WAL, so the rebuild
+        # drops to rollback journal mode for the VACUUM).
+        if cur.execute("PRAGMA page_size").fetchone()[0] != 8192:
+            has_tables = cur.execute(
+                "SELECT COUNT(*) FROM sqlite_master"
+            ).fetchone()[0]
+            if has_tables:
+                logger.info("Migration: rebuilding database with 8K pages...")
+                cur.execute("PRAGMA journal_mode=DELETE")
+                cur.execute("PRAGMA page_size=8192")
+                cur.execute("VACUUM")
+            else:
+                cur.execute("PRAGMA page_size=8192")
+
+        # journal_mode is persistent in the DB file, so set it (and the
+        # checkpoint cadence) once here instead of on every connection
+        cur.execute("PRAGMA journal_mode=WAL")
+        cur.execute("PRAGMA wal_autocheckpoint=1000")
+
         # Emails table — new schema with account_email + composite unique key
         cur.execute(
             """
@@ -123,16 +286,44 @@ def init_db():
             """
         )
 
-        # Email labels table
+        # Label names table — the ~15 label strings are stored once and
+        # referenced by integer id (dictionary encoding)
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS labels (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT NOT NULL UNIQUE
+            );
+            """
+        )
+
+        # Email labels table — references labels(id) instead of
+        # repeating the label text per row
         cur.execute(
             """
             CREATE TABLE IF NOT EXISTS email_labels (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 email_id INTEGER NOT NULL,
-                label TEXT NOT NULL,
+                label_id INTEGER NOT NULL,
+                confidence REAL DEFAULT 1.0,
+                source TEXT DEFAULT 'manual',
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 UNIQUE(email_id),
-                FOREIGN KEY(email_id) REFERENCES emails(id)
+                FOREIGN KEY(email_id) REFERENCES emails(id),
+                FOREIGN KEY(label_id) REFERENCES labels(id)
+            );
+            """
+        )
+
+        # Per-account sync state — last Gmail historyId seen, so
+        # incremental ingest can ask for changes-since instead of
+        # re-listing whole days
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS account_sync_state (
+                account_email TEXT PRIMARY KEY,
+                last_history_id TEXT,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
             );
             """
         )
@@ -180,6 +371,7 @@ def init_db():
             _migrate_emails_table_v2(conn)
 
         # Add confidence and source columns to email_labels if missing
+        # (pre-dictionary-encoding schemas only)
         label_cols = {
             row[1] for row in cur.execute("PRAGMA table_info(email_labels)").fetchall()
         }
@@ -196,17 +388,58 @@ def init_db():
             )
             logger.info("Migration: added 'source' column to email_labels")
 
+        # Check if email_labels still stores label text per row
+        if "label" in label_cols:
+            _migrate_email_labels_v3(conn)
+
         # Indexes (after migrations so columns exist)
+
+        # Covering index for the digest's date-range scans: carrying the
+        # displayed columns makes the scan index-only, so no per-row
+        # table fetch. Supersedes the old bare internal_date index
+        # (range filters and MAX(internal_date) use the leading column).
+        cur.execute("DROP INDEX IF EXISTS idx_emails_internal_date;")
+        cur.execute(
+            """
+            CREATE INDEX IF NOT EXISTS idx_emails_recent
+            ON emails(internal_date DESC, id, from_addr, subject);
+            """
+        )
+        # Composite (account_email, internal_date DESC) serves both the
+        # per-account MAX(internal_date) seek in incremental sync and
+        # per-account counts, superseding the old account-only index
+        cur.execute("DROP INDEX IF EXISTS idx_emails_account;")
         cur.execute(
             """
-            CREATE INDEX IF NOT EXISTS idx_emails_internal_date
-            ON emails(internal_date);
+            CREATE INDEX IF NOT EXISTS idx_emails_account_date
+            ON emails(account_email, internal_date DESC);
             """
         )
+        # The UNIQUE(account_email, gmail_id) index leads with
+        # account_email, so the extension's gmail_id-only batch lookup
+        # needs its own index to avoid a full scan
         cur.execute(
             """
-            CREATE INDEX IF NOT EXISTS idx_emails_account
-            ON emails(account_email);
+            CREATE INDEX IF NOT EXISTS idx_emails_gmail_id
+            ON emails(gmail_id);
+            """
+        )
+        # Lets GROUP BY label_id in get_label_summary walk an ordered
+        # index instead of sorting the whole table on every summary call
+        cur.execute("DROP INDEX IF EXISTS idx_email_labels_label;")
+        cur.execute(
+            """
+            CREATE INDEX IF NOT EXISTS idx_email_labels_label_id
+            ON email_labels(label_id);
+            """
+        )
+        # Partial index over auto/uncertain labels only: the clustering
+        # pass scans WHERE confidence < threshold, and manual labels
+        # (confidence = 1.0) never qualify
+        cur.execute(
+            """
+            CREATE INDEX IF NOT EXISTS idx_email_labels_low_conf
+            ON email_labels(confidence) WHERE confidence < 1.0;
             """
         )
 
@@ -218,33 +451,99 @@ def init_db():
 # ---------------------------------------------------------------------------
 
 
+# Multi-row VALUES beats executemany for these small rows: one prepared
+# statement executes the whole chunk without per-row statement resets.
+# 50 rows x 10 columns = 500 placeholders, comfortably under even the
+# old 999-variable SQLite limit.
+_EMAILS_INSERT_PREFIX = """
+    INSERT INTO emails
+    (gmail_id, account_email, thread_id, internal_date, from_addr,
+     to_addr, subject, snippet, body, label_ids)
+    VALUES
+"""
+_EMAILS_ROW_PLACEHOLDER = "(?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+_EMAILS_INSERT_SUFFIX = " ON CONFLICT(account_email, gmail_id) DO NOTHING"
+_BULK_INSERT_CHUNK = 50
+
+# RETURNING (SQLite >= 3.35) yields a row per actual insert, giving an
+# exact new-email count straight from the statement
+_HAS_RETURNING = sqlite3.sqlite_version_info >= (3, 35, 0)
+
+
+def save_emails_bulk(email_rows: list) -> int:
+    """
+    Insert many email rows in one transaction.
+
+    Returns the number of rows actually inserted (duplicates are
+    skipped). One commit/fsync per batch instead of one per email.
+    """
+    if not email_rows:
+        return 0
+    with get_connection() as conn:
+        inserted = 0
+        # Fallback accounting for pre-3.35 SQLite: the total_changes
+        # delta counts only rows actually written, so conflict-skipped
+        # duplicates never inflate the new-email tally
+        changes_before = conn.total_changes
+        for start in range(0, len(email_rows), _BULK_INSERT_CHUNK):
+            chunk = email_rows[start:start + _BULK_INSERT_CHUNK]
+            # Full-size chunks always produce the same SQL text, so the
+            # statement cache serves the compiled plan
+            sql = (
+                _EMAILS_INSERT_PREFIX
+                + ",".join([_EMAILS_ROW_PLACEHOLDER] * len(chunk))
+                + _EMAILS_INSERT_SUFFIX
+            )
+            if _HAS_RETURNING:
+                sql += " RETURNING id"
+            params = []
+            for r in chunk:
+                params += (
+                    r["gmail_id"],
+                    r.get("account_email", "unknown"),
+                    r["thread_id"],
+                    r["internal_date"],
+                    r["from_addr"],
+                    r["to_addr"],
+                    r["subject"],
+                    r["snippet"],
+                    r["body"],
+                    r["label_ids"],
+                )
+            cur = conn.execute(sql, params)
+            if _HAS_RETURNING:
+                inserted += len(cur.fetchall())
+        return inserted if _HAS_RETURNING else conn.total_changes - changes_before
+
+
 def save_email(email_row: dict) -> bool:
     """
     Insert a single email row. Returns True if inserted, False if duplicate.
     """
-    with get_connection() as conn:
-        cur = conn.cursor()
-        cur.execute(
-            """
-            INSERT OR IGNORE INTO emails
-            (gmail_id, account_email, thread_id, internal_date, from_addr,
-             to_addr, subject, snippet, body, label_ids)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?);
-            """,
-            (
-                email_row["gmail_id"],
-                email_row.get("account_email", "unknown"),
-                email_row["thread_id"],
-                email_row["internal_date"],
-                email_row["from_addr"],
-                email_row["to_addr"],
-                email_row["subject"],
-                email_row["snippet"],
-                email_row["body"],
-                email_row["label_ids"],
-            ),
-        )
-        return cur.rowcount > 0
+    return save_emails_bulk([email_row]) > 0
+
+
+# UPSERT instead of INSERT OR REPLACE: REPLACE deletes then re-inserts,
+# churning the row id and every index page; DO UPDATE edits in place and
+# keeps the original row (and its created_at) stable. The label text is
+# resolved to its dictionary id inline; _ensure_label_names guarantees
+# the name exists first.
+_SQL_UPSERT_LABEL = """
+    INSERT INTO email_labels (email_id, label_id, confidence, source)
+    VALUES (?, (SELECT id FROM labels WHERE name = ?), ?, ?)
+    ON CONFLICT(email_id) DO UPDATE SET
+        label_id = excluded.label_id,
+        confidence = excluded.confidence,
+        source = excluded.source;
+"""
+
+
+def _ensure_label_names(conn, names):
+    """Insert any label names not yet in the labels dictionary table."""
+    conn.executemany(
+        "INSERT OR IGNORE INTO labels (name) VALUES (?);",
+        ((n,) for n in set(names)),
+    )
 
 
 def save_label(
@@ -253,15 +552,24 @@ def save_label(
     confidence: float = 1.0,
     source: str = "manual",
 ):
-    """Insert or replace a classification label for an email."""
+    """Insert or update a classification label for an email."""
     with get_connection() as conn:
-        conn.execute(
-            """
-            INSERT OR REPLACE INTO email_labels (email_id, label, confidence, source)
-            VALUES (?, ?, ?, ?);
-            """,
-            (email_id, label, confidence, source),
-        )
+        _ensure_label_names(conn, [label])
+        conn.execute(_SQL_UPSERT_LABEL, (email_id, label, confidence, source))
+
+
+def save_labels_bulk(rows: list):
+    """
+    Insert or update many labels in one transaction.
+
+    rows: list of (email_id, label, confidence, source) tuples. One
+    commit (and one fsync) per batch instead of one per label.
+    """
+    if not rows:
+        return
+    with get_connection() as conn:
+        _ensure_label_names(conn, (r[1] for r in rows))
+        conn.executemany(_SQL_UPSERT_LABEL, rows)
 
 
 def clear_labels():
@@ -278,13 +586,14 @@ def clear_labels():
 
 def get_unlabeled_emails(batch_size: int = 20) -> list:
     """Fetch emails that have no label yet, most recent first."""
-    with get_connection() as conn:
+    with get_ro_connection() as conn:
         return conn.execute(
             """
             SELECT e.id, e.from_addr, e.subject, e.body
             FROM emails e
-            LEFT JOIN email_labels l ON e.id = l.email_id
-            WHERE l.email_id IS NULL
+            WHERE NOT EXISTS (
+                SELECT 1 FROM email_labels l WHERE l.email_id = e.id
+            )
             ORDER BY e.internal_date DESC
             LIMIT ?;
             """,
@@ -293,14 +602,25 @@ def get_unlabeled_emails(batch_size: int = 20) -> list:
 
 
 def get_unlabeled_emails_full(batch_size: int = 20) -> list:
-    """Fetch full email data for unlabeled emails (used by classifiers)."""
-    with get_connection() as conn:
+    """
+    Fetch full email data for unlabeled emails (used by classifiers).
+
+    Also returns a precomputed `text` column (sender + subject + body
+    preview) so classifiers don't rebuild it per row in Python. `body`
+    is truncated to its 500-char preview in SQL — every consumer caps
+    it there anyway, so the full body never crosses the connection.
+    """
+    with get_ro_connection() as conn:
         return conn.execute(
             """
-            SELECT e.id, e.from_addr, e.to_addr, e.subject, e.body, e.snippet
+            SELECT e.id, e.from_addr, e.to_addr, e.subject,
+                   substr(e.body, 1, 500) AS body, e.snippet,
+                   e.from_addr || ' ' || e.subject || ' '
+                       || substr(coalesce(e.body, ''), 1, 500) AS text
             FROM emails e
-            LEFT JOIN email_labels l ON e.id = l.email_id
-            WHERE l.email_id IS NULL
+            WHERE NOT EXISTS (
+                SELECT 1 FROM email_labels l WHERE l.email_id = e.id
+            )
             ORDER BY e.internal_date DESC
             LIMIT ?;
             """,
@@ -308,9 +628,43 @@ def get_unlabeled_emails_full(batch_size: int = 20) -> list:
         ).fetchall()
 
 
+def iter_unlabeled_emails(chunk_size: int = 100):
+    """
+    Yield unlabeled emails in chunks from a single cursor.
+
+    One query and one ORDER BY instead of re-running (and re-planning)
+    a LIMIT query per batch, which re-scans the unlabeled set each time.
+    Yields lists of rows shaped like get_unlabeled_emails_full. Reads
+    from the read-only connection, so label writes made while iterating
+    (on the writer connection) don't disturb the cursor's WAL snapshot.
+    """
+    try:
+        conn = _get_thread_ro_connection()
+    except sqlite3.OperationalError:
+        conn = _get_thread_connection()
+    cursor = conn.execute(
+        """
+        SELECT e.id, e.from_addr, e.to_addr, e.subject,
+               substr(e.body, 1, 500) AS body, e.snippet,
+               e.from_addr || ' ' || e.subject || ' '
+                   || substr(coalesce(e.body, ''), 1, 500) AS text
+        FROM emails e
+        WHERE NOT EXISTS (
+            SELECT 1 FROM email_labels l WHERE l.email_id = e.id
+        )
+        ORDER BY e.id;
+        """
+    )
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            break
+        yield rows
+
+
 def get_latest_internal_date(account_email: str = None) -> int | None:
     """Return the most recent internal_date in the DB, optionally per account."""
-    with get_connection() as conn:
+    with get_ro_connection() as conn:
         if account_email:
             row = conn.execute(
                 "SELECT MAX(internal_date) FROM emails WHERE account_email = ?;",
@@ -323,42 +677,188 @@ def get_latest_internal_date(account_email: str = None) -> int | None:
         return row[0] if row and row[0] else None
 
 
+def get_existing_gmail_ids(gmail_ids: list, account_email: str) -> set:
+    """
+    Return the subset of gmail_ids already stored for an account.
+
+    Used by ingest to skip the expensive full-format fetch for messages
+    the DB already has; one seek per id on the (account_email, gmail_id)
+    unique index.
+    """
+    if not gmail_ids:
+        return set()
+    with get_ro_connection() as conn:
+        cur = conn.cursor()
+        cur.row_factory = None
+        cur.execute(
+            """
+            SELECT gmail_id FROM emails
+            WHERE account_email = ?
+              AND gmail_id IN (SELECT value FROM json_each(?));
+            """,
+            (account_email, json.dumps(list(gmail_ids))),
+        )
+        return {row[0] for row in cur}
+
+
+def get_last_history_id(account_email: str) -> str | None:
+    """Return the last stored Gmail historyId for an account, or None."""
+    with get_ro_connection() as conn:
+        row = conn.execute(
+            "SELECT last_history_id FROM account_sync_state WHERE account_email = ?;",
+            (account_email,),
+        ).fetchone()
+        return row[0] if row else None
+
+
+def save_last_history_id(account_email: str, history_id: str):
+    """Record the Gmail historyId reached by the latest sync for an account."""
+    with get_connection() as conn:
+        conn.execute(
+            """
+            INSERT INTO account_sync_state (account_email, last_history_id)
+            VALUES (?, ?)
+            ON CONFLICT(account_email) DO UPDATE SET
+                last_history_id = excluded.last_history_id,
+                updated_at = CURRENT_TIMESTAMP;
+            """,
+            (account_email, history_id),
+        )
+
+
 def get_labeled_emails() -> list:
     """Fetch all labeled emails (for training). Returns full email + label."""
-    with get_connection() as conn:
-        return conn.execute(
+    return list(iter_labeled_emails())
+
+
+def iter_labeled_emails():
+    """
+    Stream labeled emails row by row (for training).
+
+    Avoids materializing every row (email bodies included) at once —
+    peak memory stays at one fetch batch instead of the whole corpus.
+    Bodies are truncated to the 500-char training preview in SQL, so
+    long HTML bodies never cross the SQLite/Python boundary.
+    """
+    with get_ro_connection() as conn:
+        cur = conn.execute(
             """
-            SELECT e.id, e.from_addr, e.subject, e.body, l.label, l.confidence, l.source
+            SELECT e.id, e.from_addr, e.subject,
+                   substr(e.body, 1, 500) AS body,
+                   lab.name AS label, l.confidence, l.source
             FROM emails e
             INNER JOIN email_labels l ON e.id = l.email_id
+            INNER JOIN labels lab ON lab.id = l.label_id
             ORDER BY e.internal_date DESC;
             """
-        ).fetchall()
+        )
+        cur.arraysize = 500
+        yield from cur
 
 
 def get_label_summary() -> dict:
     """Return {label: count} for all labeled emails."""
-    with get_connection() as conn:
+    with get_ro_connection() as conn:
         rows = conn.execute(
             """
-            SELECT label, COUNT(*) as cnt
-            FROM email_labels
-            GROUP BY label
+            SELECT lab.name AS label, COUNT(*) as cnt
+            FROM email_labels l
+            INNER JOIN labels lab ON lab.id = l.label_id
+            GROUP BY l.label_id
             ORDER BY cnt DESC;
             """
         ).fetchall()
         return {row["label"]: row["cnt"] for row in rows}
 
 
+def get_full_summary() -> tuple[dict, int]:
+    """
+    Return ({label: count}, unlabeled_count) from one aggregate query.
+
+    Collapses the separate get_label_summary + get_unlabeled_count round
+    trips used by the digest summary view.
+    """
+    with get_ro_connection() as conn:
+        rows = conn.execute(
+            """
+            SELECT lab.name AS label, COUNT(*) AS cnt
+            FROM emails e
+            LEFT JOIN email_labels l ON e.id = l.email_id
+            LEFT JOIN labels lab ON lab.id = l.label_id
+            GROUP BY l.label_id
+            ORDER BY cnt DESC;
+            """
+        ).fetchall()
+    summary = {}
+    unlabeled = 0
+    for row in rows:
+        if row["label"] is None:
+            unlabeled = row["cnt"]
+        else:
+            summary[row["label"]] = row["cnt"]
+    return summary, unlabeled
+
+
+def get_recent_emails_ranked(days: int = 7, per_label: int = 15) -> list:
+    """
+    Fetch recent emails capped at per_label rows per label in SQL.
+
+    Each row also carries group_total (the full per-label count) so
+    display code can show real group sizes without fetching every row.
+    """
+    cutoff_ms = int((datetime.now() - timedelta(days=days)).timestamp() * 1000)
+    with get_ro_connection() as conn:
+        return conn.execute(
+            """
+            SELECT * FROM (
+                SELECT e.id, e.from_addr, e.subject, e.internal_date,
+                       lab.name AS label, l.confidence, l.source,
+                       row_number() OVER (
+                           PARTITION BY l.label_id ORDER BY e.internal_date DESC
+                       ) AS rn,
+                       COUNT(*) OVER (PARTITION BY l.label_id) AS group_total
+                FROM emails e
+                LEFT JOIN email_labels l ON e.id = l.email_id
+                LEFT JOIN labels lab ON lab.id = l.label_id
+                WHERE e.internal_date >= ?
+            )
+            WHERE rn <= ?
+            ORDER BY internal_date DESC;
+            """,
+            (cutoff_ms, per_label),
+        ).fetchall()
+
+
+def get_counts() -> tuple[int, int, int]:
+    """
+    Return (total, labeled, unlabeled) email counts from one query.
+
+    One table scan instead of the three separate round trips made by
+    get_total_email_count / get_labeled_count / get_unlabeled_count.
+    """
+    with get_ro_connection() as conn:
+        row = conn.execute(
+            """
+            SELECT COUNT(*) AS total,
+                   COUNT(l.email_id) AS labeled,
+                   COUNT(*) - COUNT(l.email_id) AS unlabeled
+            FROM emails e
+            LEFT JOIN email_labels l ON e.id = l.email_id;
+            """
+        ).fetchone()
+        return (row["total"], row["labeled"], row["unlabeled"]) if row else (0, 0, 0)
+
+
 def get_unlabeled_count() -> int:
     """Return count of unlabeled emails."""
-    with get_connection() as conn:
+    with get_ro_connection() as conn:
         row = conn.execute(
             """
             SELECT COUNT(*)
             FROM emails e
-            LEFT JOIN email_labels l ON e.id = l.email_id
-            WHERE l.email_id IS NULL;
+            WHERE NOT EXISTS (
+                SELECT 1 FROM email_labels l WHERE l.email_id = e.id
+            );
             """
         ).fetchone()
         return row[0] if row else 0
@@ -366,35 +866,40 @@ def get_unlabeled_count() -> int:
 
 def get_total_email_count() -> int:
     """Return total number of emails in the database."""
-    with get_connection() as conn:
+    with get_ro_connection() as conn:
         row = conn.execute("SELECT COUNT(*) FROM emails;").fetchone()
         return row[0] if row else 0
 
 
 def get_account_email_counts() -> dict:
-    """Return {account_email: count} for all accounts."""
-    with get_connection() as conn:
+    """Return {account_email: count} for all accounts, largest first."""
+    with get_ro_connection() as conn:
         rows = conn.execute(
             """
             SELECT account_email, COUNT(*) as cnt
             FROM emails
-            GROUP BY account_email
-            ORDER BY cnt DESC;
+            GROUP BY account_email;
             """
         ).fetchall()
-        return {row["account_email"]: row["cnt"] for row in rows}
+        # Sort the handful of accounts here instead of making SQLite
+        # build a temp b-tree for the ORDER BY
+        return {
+            row["account_email"]: row["cnt"]
+            for row in sorted(rows, key=lambda r: -r["cnt"])
+        }
 
 
 def get_recent_emails(days: int = 7) -> list:
     """Fetch emails from the last N days with their labels (if any)."""
     cutoff_ms = int((datetime.now() - timedelta(days=days)).timestamp() * 1000)
-    with get_connection() as conn:
+    with get_ro_connection() as conn:
         return conn.execute(
             """
             SELECT e.id, e.from_addr, e.subject, e.internal_date,
-                   l.label, l.confidence, l.source
+                   lab.name AS label, l.confidence, l.source
             FROM emails e
             LEFT JOIN email_labels l ON e.id = l.email_id
+            LEFT JOIN labels lab ON lab.id = l.label_id
             WHERE e.internal_date >= ?
             ORDER BY e.internal_date DESC;
             """,
@@ -404,13 +909,14 @@ def get_recent_emails(days: int = 7) -> list:
 
 def get_email_with_label(email_id: int):
     """Fetch a single email with its label (if any)."""
-    with get_connection() as conn:
+    with get_ro_connection() as conn:
         return conn.execute(
             """
             SELECT e.id, e.from_addr, e.subject, e.body,
-                   l.label, l.confidence, l.source
+                   lab.name AS label, l.confidence, l.source
             FROM emails e
             LEFT JOIN email_labels l ON e.id = l.email_id
+            LEFT JOIN labels lab ON lab.id = l.label_id
             WHERE e.id = ?;
             """,
             (email_id,),
@@ -421,17 +927,20 @@ def get_emails_by_ids(email_ids: list) -> list:
     """Fetch full email rows for given internal IDs."""
     if not email_ids:
         return []
-    with get_connection() as conn:
-        placeholders = ",".join("?" for _ in email_ids)
+    with get_ro_connection() as conn:
+        # Static SQL with json_each: one plan regardless of batch size,
+        # instead of a distinct ?,?,... query per list length
         return conn.execute(
-            f"""
-            SELECT e.id, e.from_addr, e.subject, e.body, e.snippet,
-                   l.label, l.confidence, l.source
+            """
+            SELECT e.id, e.from_addr, e.subject,
+                   substr(e.body, 1, 500) AS body, e.snippet,
+                   lab.name AS label, l.confidence, l.source
             FROM emails e
             LEFT JOIN email_labels l ON e.id = l.email_id
-            WHERE e.id IN ({placeholders});
+            LEFT JOIN labels lab ON lab.id = l.label_id
+            WHERE e.id IN (SELECT value FROM json_each(?));
             """,
-            email_ids,
+            (json.dumps(list(email_ids)),),
         ).fetchall()
 
 
@@ -443,37 +952,43 @@ def get_labels_by_gmail_ids(gmail_ids: list) -> dict:
     """
     if not gmail_ids:
         return {}
-    with get_connection() as conn:
-        placeholders = ",".join("?" for _ in gmail_ids)
-        rows = conn.execute(
-            f"""
-            SELECT e.gmail_id, l.label, l.confidence, l.source
+    with get_ro_connection() as conn:
+        # Plain tuples instead of sqlite3.Row: this is the extension's
+        # hot path and the Row wrapper costs an extra allocation plus
+        # keyed lookups per row that the response dict doesn't need
+        cur = conn.cursor()
+        cur.row_factory = None
+        cur.execute(
+            """
+            SELECT e.gmail_id, lab.name AS label, l.confidence, l.source
             FROM emails e
             INNER JOIN email_labels l ON e.id = l.email_id
-            WHERE e.gmail_id IN ({placeholders});
+            INNER JOIN labels lab ON lab.id = l.label_id
+            WHERE e.gmail_id IN (SELECT value FROM json_each(?));
             """,
-            gmail_ids,
-        ).fetchall()
+            (json.dumps(list(gmail_ids)),),
+        )
         return {
-            row["gmail_id"]: {
-                "label": row["label"],
-                "confidence": row["confidence"],
-                "source": row["source"],
-            }
-            for row in rows
+            gmail_id: {"label": label, "confidence": confidence, "source": source}
+            for gmail_id, label, confidence, source in cur
         }
 
 
 def get_low_confidence_emails(threshold: float = 0.6, limit: int = 500) -> list:
     """Fetch emails with confidence below threshold (for clustering)."""
-    with get_connection() as conn:
+    with get_ro_connection() as conn:
+        # The literal `< 1.0` term lets the planner prove the partial
+        # index idx_email_labels_low_conf applies (it can't infer that
+        # from the bound parameter alone)
         return conn.execute(
             """
-            SELECT e.id, e.from_addr, e.subject, e.body, e.snippet,
-                   l.label, l.confidence
+            SELECT e.id, e.from_addr, e.subject,
+                   substr(e.body, 1, 500) AS body, e.snippet,
+                   lab.name AS label, l.confidence
             FROM emails e
             INNER JOIN email_labels l ON e.id = l.email_id
-            WHERE l.confidence < ?
+            INNER JOIN labels lab ON lab.id = l.label_id
+            WHERE l.confidence < 1.0 AND l.confidence < ?
             ORDER BY l.confidence ASC
             LIMIT ?;
             """,
@@ -483,7 +998,7 @@ def get_low_confidence_emails(threshold: float = 0.6, limit: int = 500) -> list:
 
 def get_labeled_count() -> int:
     """Return count of labeled emails."""
-    with get_connection() as conn:
+    with get_ro_connection() as conn:
         row = conn.execute("SELECT COUNT(*) FROM email_labels;").fetchone()
         return row[0] if row else 0
 
@@ -520,7 +1035,7 @@ def save_model_version(
 
 def get_latest_model_version():
     """Return the most recent model_versions row, or None."""
-    with get_connection() as conn:
+    with get_ro_connection() as conn:
         return conn.execute(
             "SELECT * FROM model_versions ORDER BY created_at DESC LIMIT 1;"
         ).fetchone()
@@ -528,7 +1043,7 @@ def get_latest_model_version():
 
 def get_model_version_history(limit: int = 10) -> list:
     """Return recent model versions for trend monitoring."""
-    with get_connection() as conn:
+    with get_ro_connection() as conn:
         return conn.execute(
             "SELECT * FROM model_versions ORDER BY created_at DESC LIMIT ?;",
             (limit,),
@@ -537,7 +1052,7 @@ def get_model_version_history(limit: int = 10) -> list:
 
 def get_model_version_count() -> int:
     """Return count of model versions."""
-    with get_connection() as conn:
+    with get_ro_connection() as conn:
         row = conn.execute("SELECT COUNT(*) FROM model_versions;").fetchone()
         return row[0] if row else 0
 
@@ -568,7 +1083,7 @@ def save_category_proposal(
 
 def get_pending_proposals() -> list:
     """Return pending category proposals."""
-    with get_connection() as conn:
+    with get_ro_connection() as conn:
         return conn.execute(
             """
             SELECT * FROM category_proposals
@@ -11,14 +11,22 @@ Usage:
 """
 
 import argparse
+import asyncio
+import hashlib
 import json
 import logging
-from collections import Counter
+from operator import itemgetter
 
 import numpy as np
-from sklearn.cluster import DBSCAN, KMeans
-from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.cluster import DBSCAN, MiniBatchKMeans
+from sklearn.feature_extraction.text import (
+    CountVectorizer,
+    HashingVectorizer,
+    TfidfTransformer,
+)
 from sklearn.metrics.pairwise import cosine_distances
+from sklearn.neighbors import NearestNeighbors
+from sklearn.pipeline import Pipeline
 
 import config
 from src import db
@@ -26,14 +34,63 @@ from src import db
 logger = logging.getLogger(__name__)
 
 
+# Bound once: itemgetter pulls all three fields per row in a single C
+# call instead of three interpreted __getitem__ lookups
+_text_fields = itemgetter("from_addr", "subject", "body")
+
+
 def _build_texts_from_emails(emails: list) -> list[str]:
-    """Build TF-IDF-ready text strings from email rows."""
-    texts = []
-    for row in emails:
-        body = (row["body"] or "")[:500]
-        text = f"{row['from_addr']} {row['subject']} {body}"
-        texts.append(text)
-    return texts
+    """Build TF-IDF-ready text strings from email rows (body arrives
+    pre-truncated to 500 chars by the DB layer)."""
+    return [
+        f"{from_addr} {subject} {body or ''}"
+        for from_addr, subject, body in map(_text_fields, emails)
+    ]
+
+
+def _top_cluster_terms(cluster_texts: list[str], n_terms: int = 10) -> list[str]:
+    """
+    Top terms for one cluster via a small CountVectorizer fit.
+
+    Feature hashing discards the global vocabulary, so the displayed
+    terms come from a per-cluster count pass instead — cheap, since a
+    cluster is at most a few hundred short texts.
+    """
+    counter = CountVectorizer(stop_words="english", max_features=1000)
+    try:
+        counts = counter.fit_transform(cluster_texts)
+    except ValueError:  # cluster texts were all stop words / empty
+        return []
+    frequencies = np.asarray(counts.sum(axis=0)).ravel()
+    n_terms = min(n_terms, frequencies.size)
+    candidates = np.argpartition(frequencies, -n_terms)[-n_terms:]
+    top = candidates[np.argsort(-frequencies[candidates])]
+    feature_names = counter.get_feature_names_out()
+    return [feature_names[i] for i in top]
+
+
+def _torch_cuda_available() -> bool:
+    """True when PyTorch with a CUDA device is installed (optional dep)."""
+    try:
+        import torch
+    except ImportError:
+        return False
+    return torch.cuda.is_available()
+
+
+def _cosine_distances_gpu(tfidf_matrix) -> np.ndarray:
+    """
+    Full cosine distance matrix computed as 1 - X @ X.T on the GPU.
+
+    Rows are re-normalized on-device so the result is exact regardless
+    of upstream normalization.
+    """
+    import torch
+
+    X = torch.from_numpy(tfidf_matrix.toarray()).to("cuda", dtype=torch.float32)
+    X = torch.nn.functional.normalize(X, dim=1)
+    distances = 1.0 - X @ X.T
+    return distances.clamp_(min=0.0).cpu().numpy()
 
 
 def cluster_uncertain_emails(email_ids: list) -> list[dict]:
@@ -63,64 +120,162 @@ def cluster_uncertain_emails(email_ids: list) -> list[dict]:
     ids = [row["id"] for row in emails]
     current_labels = [row["label"] for row in emails]
 
-    # Fit TF-IDF
-    vectorizer = TfidfVectorizer(max_features=3000, stop_words="english")
-    tfidf_matrix = vectorizer.fit_transform(texts)
-    feature_names = vectorizer.get_feature_names_out()
+    # Near-duplicates (marketing sends, auto-notifications) are common
+    # in the low-confidence pool and only inflate the quadratic cosine
+    # work. Fingerprint each normalized text and cluster one
+    # representative per fingerprint, then expand the assignments back
+    # to every member.
+    fingerprint_pos = {}
+    rep_idx = []  # representative's position in the full email list
+    rep_pos = np.empty(len(texts), dtype=np.intp)  # row -> representative
+    for i, text in enumerate(texts):
+        key = hashlib.blake2b(text.lower().encode(), digest_size=8).digest()
+        pos = fingerprint_pos.get(key)
+        if pos is None:
+            pos = len(rep_idx)
+            fingerprint_pos[key] = pos
+            rep_idx.append(i)
+        rep_pos[i] = pos
+    rep_texts = [texts[i] for i in rep_idx]
+    # Each representative weighs as many emails as it stands for, so a
+    # mass duplicate run still counts as dense for DBSCAN
+    rep_weights = np.bincount(rep_pos, minlength=len(rep_idx)).astype(float)
+    if len(rep_texts) < len(texts):
+        logger.info(
+            "Deduplicated %d emails to %d unique texts before clustering",
+            len(texts), len(rep_texts),
+        )
+
+    # Feature hashing instead of TfidfVectorizer: one pass over the
+    # corpus with no Python-level vocabulary dict (TfidfVectorizer scans
+    # twice to build one). norm='l2' on the transformer is what lets the
+    # cluster loop use plain dot products as cosine similarity.
+    vectorizer = Pipeline([
+        ("hv", HashingVectorizer(
+            n_features=2 ** 14,
+            stop_words="english",
+            alternate_sign=False,
+            norm=None,
+            # float32 halves the bandwidth for the cosine/neighbor
+            # graph; eps=0.5 clustering doesn't need double precision
+            dtype=np.float32,
+        )),
+        ("tfidf", TfidfTransformer(norm="l2")),
+    ])
+    tfidf_matrix = vectorizer.fit_transform(rep_texts)
 
     # Try DBSCAN first (auto-detects cluster count)
-    distance_matrix = cosine_distances(tfidf_matrix)
+    if len(rep_texts) > 10000 and _torch_cuda_available():
+        # n^2 cosine work is a plain normalized matmul; at this size a
+        # GPU gemm beats CPU BLAS by an order of magnitude
+        distance_matrix = _cosine_distances_gpu(tfidf_matrix)
+    elif len(rep_texts) > 2000:
+        # A dense N x N cosine matrix is O(N^2) float64 memory; past a
+        # few thousand emails build a sparse radius-neighbor graph
+        # instead (only pairs within eps are stored), which DBSCAN
+        # accepts as a precomputed sparse distance matrix.
+        nn = NearestNeighbors(
+            radius=0.5, metric="cosine", algorithm="brute", n_jobs=-1
+        )
+        nn.fit(tfidf_matrix)
+        distance_matrix = nn.radius_neighbors_graph(
+            tfidf_matrix, radius=0.5, mode="distance"
+        )
+    else:
+        distance_matrix = cosine_distances(tfidf_matrix)
     clustering = DBSCAN(eps=0.5, min_samples=10, metric="precomputed")
-    cluster_labels = clustering.fit_predict(distance_matrix)
+    cluster_labels = clustering.fit_predict(
+        distance_matrix, sample_weight=rep_weights
+    )
 
     unique_labels = set(cluster_labels)
     unique_labels.discard(-1)  # Remove noise label
 
     # Fallback to KMeans if DBSCAN found nothing
     if not unique_labels:
-        n_clusters = min(5, len(texts) // 20)
+        n_clusters = min(5, len(texts) // 20, len(rep_texts))
         if n_clusters < 2:
             logger.info("Not enough emails for KMeans clustering.")
             return []
 
         logger.info("DBSCAN found no clusters. Falling back to KMeans(n=%d)", n_clusters)
-        clustering = KMeans(n_clusters=n_clusters, random_state=42, n_init=10)
-        cluster_labels = clustering.fit_predict(tfidf_matrix)
+        # MiniBatchKMeans works on the sparse matrix natively and skips
+        # full-restart passes — ~10x faster than KMeans(n_init=10) on
+        # text at comparable quality for this advisory use
+        clustering = MiniBatchKMeans(
+            n_clusters=n_clusters,
+            random_state=42,
+            n_init=3,
+            batch_size=1024,
+            max_iter=100,
+        )
+        cluster_labels = clustering.fit_predict(
+            tfidf_matrix, sample_weight=rep_weights
+        )
         unique_labels = set(cluster_labels)
 
+    # Expand representative assignments back to every duplicate
+    cluster_labels = np.asarray(cluster_labels)[rep_pos]
+
+    # Encode current labels once so per-cluster distributions are a C
+    # bincount over integer codes instead of a Python Counter pass
+    labels_arr = np.asarray([l or "" for l in current_labels])
+    uniq, label_codes = np.unique(labels_arr, return_inverse=True)
+    uniq_keys = [u if u else None for u in uniq.tolist()]
+
+    # Group members in one argsort pass instead of a full boolean mask
+    # scan per cluster (O(N log N) vs O(N * K) comparisons)
+    order = np.argsort(cluster_labels, kind="stable")
+    sorted_labels = np.asarray(cluster_labels)[order]
+    boundaries = np.flatnonzero(np.diff(sorted_labels)) + 1
+    starts = np.concatenate(([0], boundaries))
+    ends = np.concatenate((boundaries, [len(sorted_labels)]))
+
     clusters = []
-    for cluster_id in sorted(unique_labels):
-        mask = cluster_labels == cluster_id
-        indices = np.where(mask)[0]
+    for start, end in zip(starts, ends):
+        cluster_id = sorted_labels[start]
+        if cluster_id == -1:  # DBSCAN noise
+            continue
+        indices = order[start:end]
 
         if len(indices) < config.EVOLVE_MIN_CLUSTER_SIZE:
             continue
 
-        # Top TF-IDF terms for this cluster
-        cluster_tfidf = tfidf_matrix[indices].mean(axis=0)
-        cluster_tfidf = np.asarray(cluster_tfidf).flatten()
-        top_term_indices = cluster_tfidf.argsort()[-10:][::-1]
-        top_terms = [feature_names[i] for i in top_term_indices]
-
-        # Sample email IDs (closest to centroid)
-        centroid = tfidf_matrix[indices].mean(axis=0)
-        centroid = np.asarray(centroid).flatten()
-        distances_to_centroid = cosine_distances(
-            tfidf_matrix[indices], centroid.reshape(1, -1)
-        ).flatten()
-        closest_indices = distances_to_centroid.argsort()[:3]
-        sample_ids = [ids[indices[i]] for i in closest_indices]
+        # Top terms for this cluster (hashing has no global vocabulary,
+        # so count them from the cluster's own texts)
+        top_terms = _top_cluster_terms([texts[i] for i in indices])
+
+        # Sample email IDs (closest to centroid). Rows are L2-normalized,
+        # so similarity to the unit-norm centroid is one sparse matvec —
+        # no cosine_distances renormalization pass per cluster. The
+        # fancy-indexed sub-matrix is materialized once and reused for
+        # both the mean and the matvec.
+        # Only the deduplicated representatives carry vectors; samples
+        # are picked among them (duplicates would rank identically)
+        rep_rows = np.unique(rep_pos[indices])
+        sub = tfidf_matrix[rep_rows]
+        # Column sums + one division instead of .mean(), which routes
+        # through the deprecated np.matrix API and makes an extra copy
+        mean_vec = np.asarray(sub.sum(axis=0)).ravel() / sub.shape[0]
+        centroid = mean_vec / (np.linalg.norm(mean_vec) + 1e-12)
+        similarities = sub.dot(centroid)
+        k = min(3, len(rep_rows))
+        closest = np.argpartition(-similarities, k - 1)[:k]
+        closest_indices = closest[np.argsort(-similarities[closest])]
+        sample_ids = [ids[rep_idx[rep_rows[i]]] for i in closest_indices]
 
         # Current label distribution
-        cluster_current_labels = [current_labels[i] for i in indices]
-        label_counts = Counter(cluster_current_labels)
+        counts = np.bincount(label_codes[indices], minlength=len(uniq))
+        label_counts = {
+            uniq_keys[i]: int(counts[i]) for i in np.flatnonzero(counts)
+        }
 
         clusters.append({
             "cluster_id": int(cluster_id),
             "size": len(indices),
             "top_terms": top_terms,
             "sample_ids": sample_ids,
-            "current_labels": dict(label_counts),
+            "current_labels": label_counts,
         })
 
     logger.info("Found %d clusters with >= %d emails", len(clusters), config.EVOLVE_MIN_CLUSTER_SIZE)
@@ -169,12 +324,21 @@ def propose_category_names(clusters: list) -> list[dict]:
         logger.error("ANTHROPIC_API_KEY not set. Cannot propose category names.")
         return []
 
-    client = anthropic.Anthropic(api_key=config.ANTHROPIC_API_KEY)
-    proposals = []
-
-    for cluster in novel_clusters:
-        # Get sample email details
-        sample_emails = db.get_emails_by_ids(cluster["sample_ids"])
+    # One batched lookup for every cluster's sample emails instead of a
+    # query round trip per cluster
+    all_sample_ids = [sid for c in novel_clusters for sid in c["sample_ids"]]
+    sample_map = {e["id"]: e for e in db.get_emails_by_ids(all_sample_ids)}
+
+    # The per-cluster calls are independent network round trips, so fan
+    # them out concurrently instead of stacking the RTTs; the semaphore
+    # keeps in-flight requests within Anthropic rate limits.
+    client = anthropic.AsyncAnthropic(api_key=config.ANTHROPIC_API_KEY)
+    semaphore = asyncio.Semaphore(8)
+
+    async def propose_one(cluster: dict) -> dict | None:
+        sample_emails = [
+            sample_map[sid] for sid in cluster["sample_ids"] if sid in sample_map
+        ]
         sample_texts = []
         for e in sample_emails:
             sample_texts.append(
@@ -197,11 +361,12 @@ def propose_category_names(clusters: list) -> list[dict]:
         )
 
         try:
-            response = client.messages.create(
-                model=config.LLM_MODEL,
-                max_tokens=500,
-                messages=[{"role": "user", "content": prompt}],
-            )
+            async with semaphore:
+                response = await client.messages.create(
+                    model=config.LLM_MODEL,
+                    max_tokens=500,
+                    messages=[{"role": "user", "content": prompt}],
+                )
 
             text = response.content[0].text.strip()
             # Parse JSON from response (handle markdown code blocks)
@@ -230,18 +395,22 @@ def propose_category_names(clusters: list) -> list[dict]:
                     llm_reasoning=proposal["llm_reasoning"],
                 )
 
-                proposals.append(proposal)
                 logger.info("Proposed new category: %s", proposed_name)
-            else:
-                logger.info(
-                    "Cluster %d: LLM says no new category needed. %s",
-                    cluster["cluster_id"], result.get("reasoning", ""),
-                )
+                return proposal
 
+            logger.info(
+                "Cluster %d: LLM says no new category needed. %s",
+                cluster["cluster_id"], result.get("reasoning", ""),
+            )
         except Exception as e:
             logger.warning("Failed to get LLM proposal for cluster %d: %s", cluster["cluster_id"], e)
+        return None
+
+    async def propose_all() -> list:
+        return await asyncio.gather(*(propose_one(c) for c in novel_clusters))
 
-    return proposals
+    results = asyncio.run(propose_all())
+    return [p for p in results if p is not None]
 
 
 def review_proposals_cli():
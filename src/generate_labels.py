@@ -13,17 +13,37 @@ Usage:
 """
 
 import argparse
-import json
+import asyncio
+import functools
 import logging
+import re
+import sys
+import time
+
+import orjson
 
 import config
 from src import db
 
 logger = logging.getLogger(__name__)
 
+# O(1) membership for validating every LLM result, plus interned label
+# strings so the copies stored per classification all share one object
+# (and hash by pointer downstream)
+_LABEL_SET = frozenset(config.LABELS)
+_LABEL_INTERN = {label: sys.intern(label) for label in config.LABELS}
+
 
+@functools.lru_cache(maxsize=1)
 def _build_system_prompt() -> str:
-    """Build the classification prompt dynamically from config.LABELS."""
+    """
+    Build the classification prompt dynamically from config.LABELS.
+
+    Built lazily on first LLM call (importing the module for the parser
+    alone does no string work) and cached for the run; call
+    _build_system_prompt.cache_clear() if the label taxonomy changes
+    in-process.
+    """
     categories_section = "\n".join(
         f"- {label}: {config.LABEL_DESCRIPTIONS[label]}"
         for label in config.LABELS
@@ -58,70 +78,98 @@ Example response:
 Return ONLY the JSON array, no other text."""
 
 
-SYSTEM_PROMPT = _build_system_prompt()
+@functools.lru_cache(maxsize=1)
+def _system_blocks() -> list:
+    """
+    System prompt wrapped for Anthropic prompt caching.
+
+    cache_control marks the (identical across every batch) prompt so
+    after the first batch the shared prefix is read from cache instead
+    of being re-prefilled, cutting prefill cost and time-to-first-token
+    per call.
+    """
+    return [
+        {
+            "type": "text",
+            "text": _build_system_prompt(),
+            "cache_control": {"type": "ephemeral"},
+        }
+    ]
 
 
-def _classify_batch_anthropic(emails: list[dict]) -> list[dict]:
-    """Send a batch of emails to Anthropic API for classification."""
+def _build_user_message(emails: list[dict]) -> str:
+    """Build the classification user message with truncated bodies."""
+    email_descriptions = []
+    for e in emails:
+        # body already arrives truncated to 500 chars from the DB layer
+        body_preview = e["body"] or ""
+        email_descriptions.append(
+            f"Email ID: {e['id']}\n"
+            f"From: {e['from_addr']}\n"
+            f"Subject: {e['subject']}\n"
+            f"Body preview: {body_preview}"
+        )
+
+    return "Classify these emails:\n\n" + "\n\n---\n\n".join(email_descriptions)
+
+
+def _check_anthropic_available():
+    """Return the anthropic module, or None (with a logged error) if unusable."""
     try:
         import anthropic
     except ImportError:
         logger.error(
             "anthropic package not installed. Run: pip install anthropic"
         )
-        return []
+        return None
 
     if not config.ANTHROPIC_API_KEY:
         logger.error(
             "ANTHROPIC_API_KEY not set. Add it to your .env file."
         )
-        return []
+        return None
 
-    # Build the user message with truncated bodies to control cost
-    email_descriptions = []
-    for e in emails:
-        body_preview = (e["body"] or "")[:500]
-        email_descriptions.append(
-            f"Email ID: {e['id']}\n"
-            f"From: {e['from_addr']}\n"
-            f"Subject: {e['subject']}\n"
-            f"Body preview: {body_preview}"
-        )
+    return anthropic
 
-    user_message = "Classify these emails:\n\n" + "\n\n---\n\n".join(
-        email_descriptions
-    )
+
+def _classify_batch_anthropic(emails: list[dict]) -> list[dict]:
+    """Send a batch of emails to Anthropic API for classification."""
+    anthropic = _check_anthropic_available()
+    if anthropic is None:
+        return []
+
+    user_message = _build_user_message(emails)
 
     client = anthropic.Anthropic(api_key=config.ANTHROPIC_API_KEY)
 
     response = client.messages.create(
         model=config.LLM_MODEL,
         max_tokens=1024,
-        system=SYSTEM_PROMPT,
+        system=_system_blocks(),
         messages=[{"role": "user", "content": user_message}],
     )
 
     return _parse_llm_response(response.content[0].text)
 
 
+# Locates the JSON array (or object) inside the response in one pass,
+# which also strips any markdown code fences around it
+_JSON_RE = re.compile(r"\[.*\]|\{.*\}", re.S)
+
+
 def _parse_llm_response(raw: str) -> list[dict]:
     """Parse the JSON response from the LLM, validate labels."""
-    text = raw.strip()
-    if text.startswith("```"):
-        lines = text.split("\n")
-        text = "\n".join(
-            line for line in lines
-            if not line.strip().startswith("```")
-        )
+    match = _JSON_RE.search(raw)
+    text = match.group(0) if match else raw.strip()
 
     try:
-        results = json.loads(text)
+        results = orjson.loads(text)
         if isinstance(results, dict):
             for key in ("classifications", "results", "emails"):
                 if key in results:
                     results = results[key]
                     break
-    except json.JSONDecodeError:
+    except orjson.JSONDecodeError:
         logger.error("Failed to parse LLM response: %s", raw[:300])
         return []
 
@@ -134,7 +182,7 @@ def _parse_llm_response(raw: str) -> list[dict]:
         if not isinstance(r, dict) or "id" not in r:
             continue
         label = r.get("label", "account_service")
-        if label not in config.LABELS:
+        if label not in _LABEL_SET:
             logger.warning(
                 "LLM returned unknown label '%s' for email %s, defaulting to 'account_service'",
                 label, r.get("id"),
@@ -143,17 +191,118 @@ def _parse_llm_response(raw: str) -> list[dict]:
         confidence = min(max(float(r.get("confidence", 0.5)), 0.0), 1.0)
         validated.append({
             "id": r["id"],
-            "label": label,
+            "label": _LABEL_INTERN[label],
             "confidence": confidence,
         })
 
     return validated
 
 
+# Batches kept in flight concurrently by the live-labeling loop. The
+# per-call latency is network RTT, not CPU, so overlapping requests
+# multiplies throughput up to the rate limit.
+CONCURRENT_BATCHES = 4
+
+
+async def _classify_batches_concurrent(anthropic, batches: list) -> list:
+    """Run several classification batches in flight at once."""
+    client = anthropic.AsyncAnthropic(api_key=config.ANTHROPIC_API_KEY)
+    semaphore = asyncio.Semaphore(CONCURRENT_BATCHES)
+
+    async def classify_one(emails: list[dict]) -> list[dict]:
+        async with semaphore:
+            response = await client.messages.create(
+                model=config.LLM_MODEL,
+                max_tokens=1024,
+                system=_system_blocks(),
+                messages=[
+                    {"role": "user", "content": _build_user_message(emails)}
+                ],
+            )
+        return _parse_llm_response(response.content[0].text)
+
+    return await asyncio.gather(*(classify_one(b) for b in batches))
+
+
+def _generate_labels_async_batch(batch_size: int) -> int:
+    """
+    Classify all unlabeled emails through the Message Batches API.
+
+    One asynchronous batch job replaces the serial per-batch round
+    trips (and is billed at half price); we submit every batch up
+    front, poll until the job ends, then stream the results back
+    through the normal parse/save path.
+    """
+    anthropic = _check_anthropic_available()
+    if anthropic is None:
+        return 0
+
+    # Page the full unlabeled set and serialize one request per batch
+    requests = []
+    for i, batch in enumerate(db.iter_unlabeled_emails(chunk_size=batch_size)):
+        email_dicts = [
+            {
+                "id": row["id"],
+                "from_addr": row["from_addr"],
+                "subject": row["subject"],
+                "body": row["body"],
+            }
+            for row in batch
+        ]
+        requests.append({
+            "custom_id": f"batch-{i}",
+            "params": {
+                "model": config.LLM_MODEL,
+                "max_tokens": 1024,
+                "system": _system_blocks(),
+                "messages": [
+                    {"role": "user", "content": _build_user_message(email_dicts)}
+                ],
+            },
+        })
+
+    if not requests:
+        logger.info("No unlabeled emails to classify.")
+        return 0
+
+    client = anthropic.Anthropic(api_key=config.ANTHROPIC_API_KEY)
+    batch_job = client.messages.batches.create(requests=requests)
+    logger.info(
+        "Submitted batch job %s with %d request(s). Polling...",
+        batch_job.id, len(requests),
+    )
+
+    while batch_job.processing_status != "ended":
+        time.sleep(30)
+        batch_job = client.messages.batches.retrieve(batch_job.id)
+        counts = batch_job.request_counts
+        logger.info(
+            "Batch %s: %d processing, %d succeeded, %d errored",
+            batch_job.id, counts.processing, counts.succeeded, counts.errored,
+        )
+
+    total_classified = 0
+    for entry in client.messages.batches.results(batch_job.id):
+        if entry.result.type != "succeeded":
+            logger.warning(
+                "Batch request %s failed: %s", entry.custom_id, entry.result.type
+            )
+            continue
+        results = _parse_llm_response(entry.result.message.content[0].text)
+        db.save_labels_bulk(
+            [(r["id"], r["label"], r["confidence"], "llm") for r in results]
+        )
+        total_classified += len(results)
+
+    logger.info("Batch job complete: %d emails classified", total_classified)
+    return total_classified
+
+
 def generate_labels(
     batch_size: int | None = None,
     dry_run: bool = False,
     clear_existing: bool = False,
+    async_batch: bool = False,
 ) -> int:
     """
     Fetch unlabeled emails, classify them with Claude Haiku, and save results.
@@ -162,6 +311,8 @@ def generate_labels(
         batch_size: emails per LLM call (default from config)
         dry_run: if True, print classifications but don't save
         clear_existing: if True, delete all existing labels before re-labeling
+        async_batch: if True, submit everything as one Message Batches
+            job (cheaper, no inter-batch latency; ignored for dry runs)
 
     Returns:
         total number of emails classified
@@ -173,17 +324,52 @@ def generate_labels(
         print("Clearing existing labels for re-classification...")
         db.clear_labels()
 
-    total_classified = 0
+    if async_batch and not dry_run:
+        return _generate_labels_async_batch(batch_size)
 
-    while True:
+    if dry_run:
+        # Single serial batch so previews stay small and interactive
         unlabeled = db.get_unlabeled_emails_full(batch_size=batch_size)
         if not unlabeled:
+            logger.info("No unlabeled emails to classify.")
+            return 0
+
+        email_dicts = [
+            {
+                "id": row["id"],
+                "from_addr": row["from_addr"],
+                "subject": row["subject"],
+                "body": row["body"],
+            }
+            for row in unlabeled
+        ]
+        results = _classify_batch_anthropic(email_dicts)
+        for r in results:
+            logger.info(
+                "  [DRY RUN] Email %d -> %s (%.0f%%)",
+                r["id"], r["label"], r["confidence"] * 100,
+            )
+        logger.info("Dry run complete. No labels saved.")
+        return len(results)
+
+    anthropic = _check_anthropic_available()
+    if anthropic is None:
+        return 0
+
+    total_classified = 0
+
+    while True:
+        # Page several batches ahead and run them concurrently: the LLM
+        # calls are independent network round trips, so overlapping
+        # them collapses the wall time to roughly the slowest call
+        page = db.get_unlabeled_emails_full(
+            batch_size=batch_size * CONCURRENT_BATCHES
+        )
+        if not page:
             if total_classified == 0:
                 logger.info("No unlabeled emails to classify.")
             break
 
-        logger.info("Classifying batch of %d emails...", len(unlabeled))
-
         email_dicts = [
             {
                 "id": row["id"],
@@ -191,34 +377,35 @@ def generate_labels(
                 "subject": row["subject"],
                 "body": row["body"],
             }
-            for row in unlabeled
+            for row in page
         ]
+        batches = [
+            email_dicts[i:i + batch_size]
+            for i in range(0, len(email_dicts), batch_size)
+        ]
+        logger.info(
+            "Classifying %d emails in %d concurrent batch(es)...",
+            len(email_dicts), len(batches),
+        )
 
-        results = _classify_batch_anthropic(email_dicts)
+        result_lists = asyncio.run(
+            _classify_batches_concurrent(anthropic, batches)
+        )
+        results = [r for results in result_lists for r in results]
 
         if not results:
-            logger.warning("No results from LLM for this batch. Stopping.")
+            logger.warning("No results from LLM for this page. Stopping.")
             break
 
-        for r in results:
-            if dry_run:
-                logger.info(
-                    "  [DRY RUN] Email %d -> %s (%.0f%%)",
-                    r["id"], r["label"], r["confidence"] * 100,
-                )
-            else:
-                db.save_label(
-                    r["id"], r["label"],
-                    confidence=r["confidence"], source="llm",
-                )
-                total_classified += 1
-
-        if dry_run:
-            logger.info("Dry run complete. No labels saved.")
-            return len(results)
+        # One transaction (and one fsync) per page instead of one per
+        # label — the per-row commit cost dominates once the LLM is fast
+        db.save_labels_bulk(
+            [(r["id"], r["label"], r["confidence"], "llm") for r in results]
+        )
+        total_classified += len(results)
 
         logger.info(
-            "Batch done. Total classified so far: %d", total_classified
+            "Page done. Total classified so far: %d", total_classified
         )
 
     logger.info("Label generation complete: %d emails classified", total_classified)
@@ -241,12 +428,17 @@ def main():
         "--batch-size", type=int, default=None,
         help=f"Emails per LLM call (default: {config.CLASSIFY_BATCH_SIZE})",
     )
+    parser.add_argument(
+        "--async-batch", action="store_true",
+        help="Submit all batches as one Message Batches job (50%% cheaper)",
+    )
     args = parser.parse_args()
 
     count = generate_labels(
         batch_size=args.batch_size,
         dry_run=args.dry_run,
         clear_existing=args.clear_existing,
+        async_batch=args.async_batch,
     )
     action = "Previewed" if args.dry_run else "Classified"
     print(f"\nDone. {action} {count} emails.")
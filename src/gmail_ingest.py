@@ -10,12 +10,25 @@ Usage:
 
 from __future__ import print_function
 
-import base64
+import binascii
 import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 from pathlib import Path
 
+import google_auth_httplib2
+import httplib2
 from bs4 import BeautifulSoup
+from googleapiclient.errors import HttpError
+
+# selectolax (C-backed Modest engine) parses HTML an order of magnitude
+# faster than BeautifulSoup's pure-Python parser; fall back gracefully
+# when it isn't installed
+try:
+    from selectolax.parser import HTMLParser as _SelectolaxParser
+except ImportError:  # pragma: no cover - depends on environment
+    _SelectolaxParser = None
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
@@ -29,19 +42,39 @@ logger = logging.getLogger(__name__)
 # Read-only scope — no modification permissions
 SCOPES = ["https://www.googleapis.com/auth/gmail.readonly"]
 
+# Gmail's batch endpoint accepts at most 100 sub-requests per call
+BATCH_GET_SIZE = 100
+
+# Concurrent batch calls per page; keeps us well inside Gmail's
+# per-user rate quota while overlapping the network round trips
+BATCH_FETCH_WORKERS = 4
+
 
 # ---------------------------------------------------------------------------
 # Authentication
 # ---------------------------------------------------------------------------
 
 
+# Built services cached per token file: load_existing_accounts and
+# authenticate_accounts both walk the same tokens, and rebuilding the
+# API client repeats credential loading and TLS connection setup each
+# time. A plain dict (not lru_cache) so authenticate_accounts can move
+# the entry when it renames a freshly minted token file.
+_service_cache: dict = {}
+
+
 def get_gmail_service(token_path: Path) -> tuple:
     """
     Authenticate with Gmail and return (service, account_email).
 
     Uses the shared credentials.json (OAuth client) and a per-account
     token file. If no valid token exists, launches browser OAuth flow.
+    Results are cached per token path for the life of the process.
     """
+    cached = _service_cache.get(str(token_path))
+    if cached is not None:
+        return cached
+
     creds = None
     credentials_path = str(config.CREDENTIALS_PATH)
 
@@ -57,16 +90,21 @@ def get_gmail_service(token_path: Path) -> tuple:
             )
             creds = flow.run_local_server(port=0)
 
+        # Persist eagerly after BOTH the refresh and first-auth paths:
+        # the next run then starts with a valid token and skips the
+        # round trip to Google's token endpoint entirely
         token_path.parent.mkdir(parents=True, exist_ok=True)
-        with open(str(token_path), "w") as token_file:
-            token_file.write(creds.to_json())
+        token_path.write_text(creds.to_json())
 
-    service = build("gmail", "v1", credentials=creds)
+    # cache_discovery=False: the bundled static discovery document is
+    # used, skipping the discovery-doc download and its file cache
+    service = build("gmail", "v1", credentials=creds, cache_discovery=False)
 
     # Get the account email address from the profile
     profile = service.users().getProfile(userId="me").execute()
     account_email = profile.get("emailAddress", "unknown")
 
+    _service_cache[str(token_path)] = (service, account_email)
     return service, account_email
 
 
@@ -180,16 +218,21 @@ def authenticate_accounts() -> list:
             already_exists = any(e == email for _, e in accounts)
             if already_exists:
                 print(f"  Account {email} is already connected. Skipping.")
+                _service_cache.pop(str(temp_token), None)
                 if temp_token.exists():
                     temp_token.unlink()
                 continue
 
-            # Rename token to account-specific name
+            # Rename token to account-specific name (and move its cache
+            # entry so later lookups hit by the final path)
             final_path = _token_path_for_account(email)
             if temp_token.exists():
                 if final_path.exists():
                     final_path.unlink()
                 temp_token.rename(final_path)
+            cached = _service_cache.pop(str(temp_token), None)
+            if cached is not None:
+                _service_cache[str(final_path)] = cached
 
             accounts.append((service, email))
             print(f"  Successfully authenticated: {email}")
@@ -207,12 +250,41 @@ def authenticate_accounts() -> list:
 # ---------------------------------------------------------------------------
 
 
-def get_header(headers: list, name: str) -> str:
-    """Extract a specific header value by name (case-insensitive)."""
-    for h in headers:
-        if h.get("name", "").lower() == name.lower():
-            return h.get("value", "")
-    return ""
+def header_map(headers: list) -> dict:
+    """
+    Build a {lowercased name: value} map from a message's header list.
+
+    One pass over the 20-50 headers instead of a linear scan (with
+    per-entry .lower()) for each header the caller wants.
+    """
+    return {h.get("name", "").lower(): h.get("value", "") for h in headers}
+
+
+# Downstream only ever keeps a short body preview, so cap pathological
+# HTML payloads before handing them to the parser
+_MAX_HTML_BYTES = 256 * 1024
+
+# URL-safe alphabet -> standard alphabet, computed once. Decoding via
+# translate + a2b_base64 skips urlsafe_b64decode's per-call translation
+# table rebuild and the unconditional "===" string concat.
+_B64_URL_TRANS = bytes.maketrans(b"-_", b"+/")
+
+
+def _b64_decode(data: str) -> bytes:
+    """Decode a URL-safe base64 payload, fixing up missing padding."""
+    raw = data.encode("ascii").translate(_B64_URL_TRANS)
+    raw += b"=" * (-len(raw) % 4)
+    return binascii.a2b_base64(raw)
+
+
+def _html_to_text(text: str) -> str:
+    """Convert an HTML email body to plain text."""
+    if len(text) > _MAX_HTML_BYTES:
+        text = text[:_MAX_HTML_BYTES]
+    if _SelectolaxParser is not None:
+        body = _SelectolaxParser(text).body
+        return body.text(separator="\n") if body else ""
+    return BeautifulSoup(text, "html.parser").get_text(separator="\n")
 
 
 def extract_body_from_payload(payload: dict) -> str:
@@ -221,44 +293,37 @@ def extract_body_from_payload(payload: dict) -> str:
 
     Preference:
       1. text/plain part
-      2. text/html (converted to text via BeautifulSoup)
+      2. text/html (converted to text)
       3. fallback to empty string
-    """
 
-    def walk_parts(part):
-        mime_type = part.get("mimeType", "")
-        body = part.get("body", {})
-        data = body.get("data")
+    The MIME tree is walked iteratively with an explicit stack, and only
+    the winning part is base64-decoded: the old recursive walk decoded
+    every part it touched (attachments included) before discarding them.
+    """
+    plain_data = None
+    html_data = None
 
+    stack = deque([payload])
+    while stack:
+        part = stack.popleft()
+        data = part.get("body", {}).get("data")
         if data:
-            decoded_bytes = base64.urlsafe_b64decode(data + "===")
-            text = decoded_bytes.decode("utf-8", errors="ignore")
-
+            mime_type = part.get("mimeType", "")
             if mime_type == "text/plain":
-                return text
-            elif mime_type == "text/html":
-                soup = BeautifulSoup(text, "html.parser")
-                return soup.get_text(separator="\n")
-
-        for sub in part.get("parts", []) or []:
-            result = walk_parts(sub)
-            if result:
-                return result
-        return None
-
-    text = walk_parts(payload)
-    if text:
-        return text.strip()
-
-    # Fallback: payload itself has data without parts
-    body = payload.get("body", {})
-    data = body.get("data")
-    if data:
-        decoded_bytes = base64.urlsafe_b64decode(data + "===")
-        text = decoded_bytes.decode("utf-8", errors="ignore")
-        soup = BeautifulSoup(text, "html.parser")
-        return soup.get_text(separator="\n").strip()
-
+                plain_data = data
+                break  # best candidate found, stop walking
+            if mime_type == "text/html" and html_data is None:
+                html_data = data
+        stack.extend(part.get("parts") or ())
+
+    # Truncate BEFORE stripping so the whitespace scan is bounded by the
+    # stored size, not by however large the original body was
+    if plain_data:
+        text = _b64_decode(plain_data).decode("utf-8", errors="ignore")
+        return text[:config.GMAIL_BODY_MAX_CHARS].strip()
+    if html_data:
+        text = _b64_decode(html_data).decode("utf-8", errors="ignore")
+        return _html_to_text(text)[:config.GMAIL_BODY_MAX_CHARS].strip()
     return ""
 
 
@@ -267,32 +332,200 @@ def extract_body_from_payload(payload: dict) -> str:
 # ---------------------------------------------------------------------------
 
 
-def _fetch_single_email(service, msg_id: str, account_email: str) -> dict:
-    """Fetch a single email by ID and return a dict ready for DB insertion."""
-    msg_detail = service.users().messages().get(
-        userId="me",
-        id=msg_id,
-        format="full",
-    ).execute()
+# A snippet this long means Gmail already gave us a full-length plain
+# preview; anything shorter suggests the body itself is tiny
+_FAST_BODY_SNIPPET_MIN = 180
+
 
+def _message_to_row(msg_detail: dict, account_email: str) -> dict:
+    """Convert a fetched Gmail message payload to a dict ready for DB insertion."""
+    msg_id = msg_detail["id"]
     payload = msg_detail.get("payload", {})
-    headers = payload.get("headers", [])
+    headers = header_map(payload.get("headers", []))
     label_ids = msg_detail.get("labelIds", [])
+    snippet = msg_detail.get("snippet", "")
+
+    # Fast body mode: for simple single-part messages the snippet is
+    # already a plain-text preview, so skip decode + HTML parsing
+    if (
+        config.GMAIL_FAST_BODY_MODE
+        and len(snippet) >= _FAST_BODY_SNIPPET_MIN
+        and not payload.get("mimeType", "").startswith("multipart/")
+    ):
+        body = snippet
+    else:
+        body = extract_body_from_payload(payload)
 
     return {
         "gmail_id": msg_id,
         "account_email": account_email,
         "thread_id": msg_detail.get("threadId", ""),
         "internal_date": int(msg_detail.get("internalDate", 0)),
-        "from_addr": get_header(headers, "From"),
-        "to_addr": get_header(headers, "To"),
-        "subject": get_header(headers, "Subject") or "(no subject)",
-        "snippet": msg_detail.get("snippet", ""),
-        "body": extract_body_from_payload(payload),
+        "from_addr": headers.get("from", ""),
+        "to_addr": headers.get("to", ""),
+        "subject": headers.get("subject") or "(no subject)",
+        "snippet": snippet,
+        "body": body,
         "label_ids": ",".join(label_ids),
     }
 
 
+def _authorized_http(service) -> google_auth_httplib2.AuthorizedHttp:
+    """
+    Build a fresh authorized HTTP object for one worker thread.
+
+    httplib2.Http is not thread-safe, so concurrent batch executions
+    must not share the service's default transport; each worker gets its
+    own connection wrapping the same credentials.
+    """
+    return google_auth_httplib2.AuthorizedHttp(
+        service._http.credentials, http=httplib2.Http()
+    )
+
+
+def _fetch_message_batch(service, msg_ids: list, http=None) -> tuple[dict, dict]:
+    """
+    Fetch many messages in one HTTP round trip via the Gmail batch endpoint.
+
+    Instead of one synchronous messages().get() call per ID (one HTTPS
+    round trip each), up to BATCH_GET_SIZE gets ride in a single
+    multipart POST. Returns ({msg_id: message_detail}, {msg_id: exception})
+    so per-message failures don't abort the rest of the batch.
+    """
+    responses = {}
+    errors = {}
+
+    def _collect(request_id, response, exception):
+        if exception is not None:
+            errors[request_id] = exception
+        else:
+            responses[request_id] = response
+
+    batch = service.new_batch_http_request(callback=_collect)
+    for msg_id in msg_ids:
+        batch.add(
+            service.users().messages().get(
+                userId="me", id=msg_id, format="full"
+            ),
+            request_id=msg_id,
+        )
+    batch.execute(http=http)
+
+    return responses, errors
+
+
+def _fetch_and_store_ids(service, msg_ids: list, account_email: str) -> tuple[int, int]:
+    """
+    Batch-fetch the given message IDs and store them in one transaction.
+
+    Returns (fetched, new) counts. Shared by the page-based listing path
+    and the historyId incremental path.
+    """
+    # Skip messages the DB already has: one batched index lookup saves a
+    # full-format fetch (tens to hundreds of KB) per known message, so
+    # overlap re-runs move almost no data
+    existing = db.get_existing_gmail_ids(msg_ids, account_email)
+    if existing:
+        logger.info(
+            "[%s] Skipping %d already-stored messages",
+            account_email, len(existing),
+        )
+        msg_ids = [m for m in msg_ids if m not in existing]
+    if not msg_ids:
+        return 0, 0
+
+    chunks = [
+        msg_ids[start:start + BATCH_GET_SIZE]
+        for start in range(0, len(msg_ids), BATCH_GET_SIZE)
+    ]
+
+    # Overlap the batch round trips: each worker executes its batch
+    # on its own authorized transport (httplib2 is not thread-safe)
+    if len(chunks) > 1:
+        with ThreadPoolExecutor(
+            max_workers=min(BATCH_FETCH_WORKERS, len(chunks))
+        ) as executor:
+            batch_results = list(executor.map(
+                lambda chunk: _fetch_message_batch(
+                    service, chunk, http=_authorized_http(service)
+                ),
+                chunks,
+            ))
+    else:
+        batch_results = [_fetch_message_batch(service, chunks[0])]
+
+    # Accumulate the whole page and store it in one transaction:
+    # one commit (one fsync) per page instead of one per email
+    page_rows = []
+    for responses, errors in batch_results:
+        for msg_id, exc in errors.items():
+            logger.warning(
+                "[%s] Failed to fetch message %s: %s",
+                account_email, msg_id, exc,
+            )
+
+        for msg_detail in responses.values():
+            try:
+                page_rows.append(_message_to_row(msg_detail, account_email))
+            except Exception as e:
+                logger.warning(
+                    "[%s] Failed to parse message %s: %s",
+                    account_email, msg_detail.get("id"), e,
+                )
+                continue
+
+    new_count = db.save_emails_bulk(page_rows)
+    return len(page_rows), new_count
+
+
+def _list_history_message_ids(service, start_history_id: str) -> list:
+    """
+    List message IDs added since a previous sync point via users.history.
+
+    Returns only the delta since start_history_id, so a re-run lists a
+    handful of records instead of whole days. Raises HttpError 404 when
+    the historyId has expired; the caller falls back to the date query.
+    """
+    msg_ids = []
+    seen = set()
+    page_token = None
+
+    while True:
+        request_kwargs = {
+            "userId": "me",
+            "startHistoryId": start_history_id,
+            "historyTypes": ["messageAdded"],
+        }
+        if page_token:
+            request_kwargs["pageToken"] = page_token
+
+        results = service.users().history().list(**request_kwargs).execute()
+
+        for record in results.get("history", []):
+            for added in record.get("messagesAdded", []):
+                msg_id = added.get("message", {}).get("id")
+                if msg_id and msg_id not in seen:
+                    seen.add(msg_id)
+                    msg_ids.append(msg_id)
+
+        page_token = results.get("nextPageToken")
+        if not page_token:
+            break
+
+    return msg_ids
+
+
+def _save_sync_point(service, account_email: str):
+    """Record the account's current historyId for the next incremental run."""
+    try:
+        profile = service.users().getProfile(userId="me").execute()
+        history_id = profile.get("historyId")
+        if history_id:
+            db.save_last_history_id(account_email, str(history_id))
+    except Exception as e:
+        logger.warning("[%s] Could not save sync point: %s", account_email, e)
+
+
 def fetch_and_store_emails(
     service,
     account_email: str,
@@ -315,7 +548,40 @@ def fetch_and_store_emails(
     max_per_page = max_per_page or config.GMAIL_MAX_RESULTS_PER_PAGE
     max_pages = max_pages or config.GMAIL_MAX_PAGES
 
-    # Incremental sync: only fetch emails newer than what we have for this account
+    # Preferred incremental path: users.history returns only the delta
+    # since the last stored historyId, instead of re-listing whole days
+    last_history_id = db.get_last_history_id(account_email)
+    if last_history_id:
+        try:
+            msg_ids = _list_history_message_ids(service, last_history_id)
+            logger.info(
+                "[%s] History sync: %d new messages since historyId %s",
+                account_email, len(msg_ids), last_history_id,
+            )
+            new_count = 0
+            total_fetched = 0
+            if msg_ids:
+                total_fetched, new_count = _fetch_and_store_ids(
+                    service, msg_ids, account_email
+                )
+            _save_sync_point(service, account_email)
+            logger.info(
+                "[%s] Done: %d fetched, %d new emails stored",
+                account_email, total_fetched, new_count,
+            )
+            return new_count
+        except HttpError as e:
+            if e.resp.status == 404:
+                # historyId expired (Gmail keeps roughly a week of
+                # history) — fall through to the date-query path
+                logger.info(
+                    "[%s] Stored historyId expired; falling back to date query",
+                    account_email,
+                )
+            else:
+                raise
+
+    # Fallback incremental sync: only fetch emails newer than what we have
     query = None
     latest_date = db.get_latest_internal_date(account_email=account_email)
     if latest_date:
@@ -361,32 +627,22 @@ def fetch_and_store_emails(
             account_email, len(messages), page_num + 1,
         )
 
-        for i, msg_stub in enumerate(messages, start=1):
-            try:
-                email_row = _fetch_single_email(
-                    service, msg_stub["id"], account_email
-                )
-                was_new = db.save_email(email_row)
-                if was_new:
-                    new_count += 1
-                total_fetched += 1
-                if total_fetched % 50 == 0:
-                    logger.info(
-                        "[%s] Progress: %d fetched, %d new",
-                        account_email, total_fetched, new_count,
-                    )
-            except Exception as e:
-                logger.warning(
-                    "[%s] Failed to fetch message %s: %s",
-                    account_email, msg_stub["id"], e,
-                )
-                continue
+        fetched, new = _fetch_and_store_ids(
+            service, [m["id"] for m in messages], account_email
+        )
+        total_fetched += fetched
+        new_count += new
+        logger.info(
+            "[%s] Progress: %d fetched, %d new",
+            account_email, total_fetched, new_count,
+        )
 
         page_token = results.get("nextPageToken")
         if not page_token:
             logger.info("[%s] No more pages available.", account_email)
             break
 
+    _save_sync_point(service, account_email)
     logger.info(
         "[%s] Done: %d fetched, %d new emails stored",
         account_email, total_fetched, new_count,
@@ -429,25 +685,38 @@ def run_multi_account_ingest():
     print(f"\nFetching emails from {len(accounts)} account(s)...")
     print(f"Target: {target:,} emails total\n")
 
+    # Accounts are independent and network-latency bound, so ingest them
+    # concurrently — one thread per account, each with its own service
+    # (and thus its own HTTP transport). SQLite writes serialize through
+    # WAL + busy_timeout on each thread's own connection.
     total_new = 0
-    for service, email in accounts:
-        print(f"--- Fetching from {email} ---")
-        new_count = fetch_and_store_emails(
-            service=service,
-            account_email=email,
-            max_per_page=config.GMAIL_MAX_RESULTS_PER_PAGE,
-            max_pages=config.GMAIL_BULK_MAX_PAGES,
-            fetch_all_labels=True,
-        )
-        total_new += new_count
+    with ThreadPoolExecutor(max_workers=len(accounts)) as executor:
+        futures = {
+            executor.submit(
+                fetch_and_store_emails,
+                service=service,
+                account_email=email,
+                max_per_page=config.GMAIL_MAX_RESULTS_PER_PAGE,
+                max_pages=config.GMAIL_BULK_MAX_PAGES,
+                fetch_all_labels=True,
+            ): email
+            for service, email in accounts
+        }
+        for future in as_completed(futures):
+            email = futures[future]
+            try:
+                new_count = future.result()
+            except Exception as e:
+                logger.error("[%s] Ingest failed: %s", email, e)
+                continue
+            total_new += new_count
 
-        current_total = db.get_total_email_count()
-        print(f"  New from {email}: {new_count:,}")
-        print(f"  Total in DB: {current_total:,}\n")
+            current_total = db.get_total_email_count()
+            print(f"  New from {email}: {new_count:,}")
+            print(f"  Total in DB: {current_total:,}\n")
 
-        if current_total >= target:
-            print(f"Reached target of {target:,} emails.")
-            break
+            if current_total >= target:
+                print(f"Reached target of {target:,} emails.")
 
     # Print summary
     counts = db.get_account_email_counts()
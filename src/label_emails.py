@@ -42,6 +42,11 @@ def main():
     _print_label_menu()
     print("\nType label name to assign, 's' to skip, 'q' to quit.\n")
 
+    # Build the prompt and membership set once rather than re-joining
+    # the label list (and linearly scanning it) on every input round
+    prompt = f"Label ({'/'.join(config.LABELS)} / s=skip / q=quit): "
+    labels_set = frozenset(config.LABELS)
+
     while True:
         rows = db.get_unlabeled_emails(batch_size=5)
         if not rows:
@@ -57,26 +62,15 @@ def main():
             preview = shorten(body.replace("\n", " "), width=200, placeholder="...")
             print(f"Body: {preview}")
 
-            # Show existing auto-label as a hint if available
-            full = db.get_email_with_label(email_id)
-            if full and full["label"]:
-                conf = full["confidence"] or 1.0
-                print(
-                    f"  -> Auto-suggested: {full['label']} "
-                    f"({conf:.0%}, source: {full['source']})"
-                )
-
             while True:
-                user_input = input(
-                    f"Label ({'/'.join(config.LABELS)} / s=skip / q=quit): "
-                ).strip()
+                user_input = input(prompt).strip()
                 if user_input == "q":
                     print("Quitting.")
                     return
                 elif user_input == "s":
                     print("Skipped.")
                     break
-                elif user_input in config.LABELS:
+                elif user_input in labels_set:
                     db.save_label(email_id, user_input, confidence=1.0, source="manual")
                     print(f"Labeled as: {user_input}")
                     break
@@ -1,5 +1,5 @@
 """
-Train a TF-IDF + Random Forest classifier on labeled email data.
+Train a hashed TF-IDF + logistic regression classifier on labeled email data.
 
 Fetches labeled emails from the database, trains a scikit-learn pipeline,
 evaluates with a train/test split, and saves the model to disk.
@@ -8,18 +8,25 @@ Usage:
     python -m src.train_model
 """
 
+from __future__ import annotations
+
 import argparse
-import json
+import atexit
 import logging
 import os
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from operator import itemgetter
 
 import joblib
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics import classification_report
-from sklearn.model_selection import train_test_split
-from sklearn.pipeline import Pipeline
+import numpy as np
+import orjson
+
+# sklearn is imported lazily inside build_pipeline/train_and_evaluate:
+# pulling in its Cython extensions costs ~0.5-1.5s, and modules that
+# import this one for retrain_and_version shouldn't pay that until a
+# training run actually starts.
 
 import config
 from src import db
@@ -28,29 +35,70 @@ logger = logging.getLogger(__name__)
 
 MODEL_PATH = config.MODEL_DIR / "email_classifier.joblib"
 
+# Single C-level field extraction per row instead of three keyed
+# sqlite3.Row lookups in the hot loop
+_train_fields = itemgetter("from_addr", "subject", "body", "label")
+
+# Disk-cache assembled training data keyed on the DB file state, so
+# auto-evolve retrains against an unchanged label set skip the SQLite
+# fetch and per-row formatting entirely
+_memory = joblib.Memory(location=str(config.MODEL_DIR / "cache"), verbose=0)
+
+# Version-metadata inserts happen off the critical path: save_model
+# returns once the model files are on disk and the DB write finishes in
+# the background (db.py gives each thread its own connection). Single
+# worker keeps inserts ordered; atexit makes sure none are dropped.
+_metadata_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="model-meta")
+atexit.register(_metadata_executor.shutdown, wait=True)
+_pending_metadata = None
+
+
+def _db_fingerprint() -> tuple:
+    """
+    Cheap identity key for the current training set.
+
+    Covers the WAL file too: under WAL mode, fresh label writes live
+    there until a checkpoint touches the main database file.
+    """
+    parts = []
+    for path in (str(config.DB_PATH), f"{config.DB_PATH}-wal"):
+        try:
+            st = os.stat(path)
+            parts += (st.st_mtime_ns, st.st_size)
+        except OSError:
+            parts += (0, 0)
+    return tuple(parts)
+
+
+@_memory.cache
+def _load_training_data_cached(db_path: str, fingerprint: tuple) -> tuple:
+    """Assemble (texts, labels); memoized per (db_path, fingerprint)."""
+    texts = []
+    labels = []
+    # Stream rows so the full corpus (bodies included) is never held in
+    # memory alongside the feature lists; " ".join over a tuple skips
+    # the f-string formatting machinery per row. Bodies arrive already
+    # truncated to 500 chars by the SQL, so no Python-side slicing.
+    for from_addr, subject, body, label in map(_train_fields, db.iter_labeled_emails()):
+        texts.append(" ".join((from_addr or "", subject or "", body or "")))
+        labels.append(label)
+    return texts, labels
+
 
 def load_training_data() -> tuple[list[str], list[str]]:
     """
     Load labeled emails from the database and return (texts, labels).
 
     Each text is a combination of from_addr, subject, and body preview
-    to give the model sender + content signal.
+    to give the model sender + content signal. Results are cached on
+    disk and reused while the database file is unchanged.
     """
-    rows = db.get_labeled_emails()
+    texts, labels = _load_training_data_cached(str(config.DB_PATH), _db_fingerprint())
 
-    if not rows:
+    if not texts:
         logger.error("No labeled emails found in the database.")
         return [], []
 
-    texts = []
-    labels = []
-    for row in rows:
-        # Combine sender, subject, and body (truncated) as features
-        body = (row["body"] or "")[:500]
-        text = f"{row['from_addr']} {row['subject']} {body}"
-        texts.append(text)
-        labels.append(row["label"])
-
     logger.info(
         "Loaded %d labeled emails across %d categories",
         len(texts), len(set(labels)),
@@ -59,22 +107,73 @@ def load_training_data() -> tuple[list[str], list[str]]:
 
 
 def build_pipeline() -> Pipeline:
-    """Create the TF-IDF + Random Forest pipeline."""
+    """Create the hashed TF-IDF + logistic regression pipeline."""
+    from sklearn.feature_extraction.text import HashingVectorizer, TfidfTransformer
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.pipeline import Pipeline
+
     return Pipeline([
-        ("tfidf", TfidfVectorizer(
-            max_features=5000,
+        # Hashing is stateless and single-pass: no vocabulary dict to
+        # build, prune to max_features, or carry around in the pickle.
+        # The classifier only sees feature indices, so accuracy holds.
+        ("hash", HashingVectorizer(
+            n_features=2 ** 13,
             ngram_range=(1, 2),
             stop_words="english",
-            sublinear_tf=True,
+            alternate_sign=False,
+            norm=None,
+            # float32 halves the feature-matrix memory and the bytes
+            # moved when the saved model is loaded for classification
+            dtype=np.float32,
         )),
-        ("clf", RandomForestClassifier(
-            n_estimators=100,
+        ("tfidf", TfidfTransformer(sublinear_tf=True)),
+        # A linear model fits sparse TF-IDF an order of magnitude faster
+        # than random-forest split scans and serializes to one small
+        # coefficient matrix. LogisticRegression over LinearSVC because
+        # classify.py's uncertainty flagging needs real predict_proba,
+        # and wrapping SVC in CalibratedClassifierCV needs per-class CV
+        # folds the tiny-dataset path can't guarantee.
+        ("clf", LogisticRegression(
+            C=10.0,
+            max_iter=1000,
             random_state=42,
-            n_jobs=-1,
         )),
     ])
 
 
+@_memory.cache
+def _hashed_feature_matrix(texts: list, vectorizer):
+    """
+    Vectorize the corpus, memoized on (texts, vectorizer params).
+
+    Hashing the arguments for the cache key is far cheaper than the 1-2
+    gram tokenization it skips, so auto-evolve retrains on an unchanged
+    corpus reuse the sparse matrix from disk. Safe to cache because
+    HashingVectorizer is stateless — same input, same output.
+    """
+    return vectorizer.transform(texts)
+
+
+def _format_report(report: dict) -> str:
+    """Render a classification_report dict in the familiar table layout."""
+    width = max(len(name) for name in report)
+    header = f"{'':>{width}}  {'precision':>9} {'recall':>9} {'f1-score':>9} {'support':>9}"
+    lines = [header, ""]
+    for name, row in report.items():
+        if name == "accuracy":
+            lines.append("")
+            lines.append(
+                f"{name:>{width}}  {'':>9} {'':>9} {row:>9.2f} "
+                f"{int(report['weighted avg']['support']):>9}"
+            )
+            continue
+        lines.append(
+            f"{name:>{width}}  {row['precision']:>9.2f} {row['recall']:>9.2f} "
+            f"{row['f1-score']:>9.2f} {int(row['support']):>9}"
+        )
+    return "\n".join(lines)
+
+
 def train_and_evaluate(
     texts: list[str],
     labels: list[str],
@@ -86,6 +185,9 @@ def train_and_evaluate(
     If the dataset is too small for a meaningful split (< 10 samples),
     trains on the full dataset without evaluation.
     """
+    from sklearn.metrics import classification_report
+    from sklearn.model_selection import StratifiedShuffleSplit
+
     pipeline = build_pipeline()
 
     if len(texts) < 10:
@@ -96,19 +198,35 @@ def train_and_evaluate(
         pipeline.fit(texts, labels)
         return pipeline, {"note": "too few samples for evaluation"}
 
-    X_train, X_test, y_train, y_test = train_test_split(
-        texts, labels, test_size=test_size, random_state=42, stratify=labels,
+    # Vectorize the full corpus once (disk-cached across retrains), then
+    # split by row index: stratified sampling and sparse row selection
+    # both happen in C, and train/test never exist as separate text lists.
+    X_all = _hashed_feature_matrix(texts, pipeline.named_steps["hash"])
+    labels_arr = np.asarray(labels)
+
+    # Same stratified shuffle train_test_split delegates to, but taking
+    # indices instead of copying Python lists element by element
+    splitter = StratifiedShuffleSplit(
+        n_splits=1, test_size=test_size, random_state=42,
     )
+    train_idx, test_idx = next(splitter.split(X_all, labels_arr))
+    y_train, y_test = labels_arr[train_idx], labels_arr[test_idx]
 
-    logger.info("Training on %d samples, testing on %d...", len(X_train), len(X_test))
-    pipeline.fit(X_train, y_train)
+    logger.info("Training on %d samples, testing on %d...", len(train_idx), len(test_idx))
+    # Fit the tfidf+clf tail on pre-hashed features; pipeline[1:] shares
+    # the step instances, so the full pipeline ends up fitted and still
+    # accepts raw text at inference (hashing is stateless).
+    tail = pipeline[1:]
+    tail.fit(X_all[train_idx], y_train)
 
-    y_pred = pipeline.predict(X_test)
+    y_pred = tail.predict(X_all[test_idx])
     report = classification_report(y_test, y_pred, output_dict=True, zero_division=0)
 
-    # Print human-readable report
+    # Print human-readable report, formatted from the dict we already
+    # have — classification_report recomputes every per-class metric
+    # from scratch on each call, so don't invoke it a second time
     print("\n=== Classification Report ===")
-    print(classification_report(y_test, y_pred, zero_division=0))
+    print(_format_report(report))
 
     return pipeline, report
 
@@ -121,21 +239,37 @@ def save_model(pipeline: Pipeline, report: dict = None, trigger: str = "manual")
     - Also overwrites the 'latest' file so classify.py keeps working
     - Records metrics to model_versions DB table
     """
+    global _pending_metadata
     config.MODEL_DIR.mkdir(parents=True, exist_ok=True)
 
+    # Drain any still-running metadata insert from a previous save so the
+    # version count below can't race it
+    if _pending_metadata is not None:
+        _pending_metadata.result()
+        _pending_metadata = None
+
     # Generate version string
     version_num = db.get_model_version_count() + 1
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     version = f"v{version_num}_{timestamp}"
 
-    # Save versioned file
+    # Save versioned file. zlib level 3 shrinks the pickle several-fold
+    # (no extra dependency), and protocol 5 serializes the coefficient
+    # arrays as out-of-band buffers instead of byte-copying them.
     versioned_path = config.MODEL_DIR / f"email_classifier_{version}.joblib"
-    joblib.dump(pipeline, str(versioned_path))
+    joblib.dump(pipeline, str(versioned_path), compress=("zlib", 3), protocol=5)
     logger.info("Versioned model saved to %s", versioned_path)
 
-    # Also overwrite the 'latest' file (backward compat with classify.py)
-    joblib.dump(pipeline, str(MODEL_PATH))
-    logger.info("Latest model saved to %s", MODEL_PATH)
+    # The 'latest' file (backward compat with classify.py) is a relative
+    # symlink to the versioned dump rather than a second serialization
+    # of the same pipeline — halves save CPU and disk writes per retrain
+    MODEL_PATH.unlink(missing_ok=True)
+    try:
+        os.symlink(versioned_path.name, MODEL_PATH)
+    except OSError:
+        # Filesystems without symlink support: hardlink instead
+        os.link(versioned_path, MODEL_PATH)
+    logger.info("Latest model -> %s", versioned_path.name)
 
     # Extract metrics from report
     accuracy = 0.0
@@ -154,15 +288,18 @@ def save_model(pipeline: Pipeline, report: dict = None, trigger: str = "manual")
         weighted_avg = report.get("weighted avg", {})
         num_samples = int(weighted_avg.get("support", 0)) if isinstance(weighted_avg, dict) else 0
 
-    # Record to DB
-    db.save_model_version(
+    # Record to DB in the background — the insert isn't needed to return
+    # the version string, so callers get the new model a few ms sooner
+    _pending_metadata = _metadata_executor.submit(
+        db.save_model_version,
         version=version,
         model_path=str(versioned_path),
         num_samples=num_samples,
         num_categories=num_categories,
         accuracy=accuracy,
         macro_f1=macro_f1,
-        report_json=json.dumps(report) if report else "{}",
+        # orjson formats the report's many float leaves in C
+        report_json=orjson.dumps(report).decode() if report else "{}",
         trigger=trigger,
     )
 
@@ -181,6 +318,9 @@ def retrain_and_version(trigger: str = "auto") -> tuple:
     if not texts:
         logger.warning("No training data for retrain.")
         return None, None
+    if len(set(labels)) < 2:
+        logger.warning("Need at least 2 label classes to train; skipping retrain.")
+        return None, None
 
     pipeline, report = train_and_evaluate(texts, labels)
     version = save_model(pipeline, report=report, trigger=trigger)
@@ -213,14 +353,14 @@ def main():
     if not texts:
         print("No training data available. Run generate_labels first.")
         return
-
-    label_counts = {}
-    for label in labels:
-        label_counts[label] = label_counts.get(label, 0) + 1
+    if len(set(labels)) < 2:
+        print("Need at least 2 label classes to train. Label more emails first.")
+        return
 
     print(f"\nTraining data: {len(texts)} emails")
     print("Label distribution:")
-    for label, count in sorted(label_counts.items(), key=lambda x: -x[1]):
+    # C-level counting and sorting instead of a dict.get loop + lambda sort
+    for label, count in Counter(labels).most_common():
         print(f"  {label}: {count}")
 
     pipeline, metrics = train_and_evaluate(texts, labels, test_size=args.test_size)